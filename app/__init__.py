@@ -1,11 +1,19 @@
 import os
 import logging
-from flask import Flask
-from werkzeug.middleware.proxy_fix import ProxyFix
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Optional
 
+if TYPE_CHECKING:
+    from flask import Flask
+
+# Flask is imported inside create_app: burst pool processes import app.services.*,
+# which runs this file, and should load only Pillow and the compositing code
+
+
+def create_app() -> 'Flask':
+    from flask import Flask
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    from dotenv import load_dotenv
 
-def create_app() -> Flask:
     load_dotenv()
 
     app = Flask(__name__, static_folder='../static', template_folder='../templates')
@@ -13,32 +21,52 @@ def create_app() -> Flask:
     app.config['UPLOAD_FOLDER'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'frames'))
     app.config['PHOTOS_FOLDER'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'photos'))
     app.config['SETTINGS_PATH'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'settings.json'))
+    app.config['SHARE_QUEUE_PATH'] = os.path.join(os.path.dirname(app.config['SETTINGS_PATH']), 'outbox.sqlite3')
+    app.config['TTS_WARMUP_PATH'] = os.path.join(os.path.dirname(app.config['SETTINGS_PATH']), 'tts_warmup.json')
+    # Internal nginx location aliased to PHOTOS_FOLDER; when set, photo bytes are sent by nginx
+    app.config['PHOTOS_ACCEL_PREFIX'] = os.getenv('PHOTOS_ACCEL_PREFIX', '')
+    app.config['PIPER_MODELS_FOLDER'] = os.path.abspath(os.getenv('PIPER_MODELS_FOLDER', os.path.join(os.path.dirname(__file__), '..', 'piper', 'models')))
+    app.config['TTS_CACHE_FOLDER'] = os.path.abspath(os.getenv('TTS_CACHE_FOLDER', os.path.join(os.path.dirname(__file__), '..', 'cache', 'tts')))
 
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['PHOTOS_FOLDER'], exist_ok=True)
     os.makedirs(os.path.dirname(app.config['SETTINGS_PATH']), exist_ok=True)
+    os.makedirs(app.config['TTS_CACHE_FOLDER'], exist_ok=True)
 
     # Logging setup
     log_level_name = os.getenv('LOG_LEVEL', 'INFO').upper()
     log_level = getattr(logging, log_level_name, logging.INFO)
     logging.basicConfig(level=log_level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
     logging.getLogger('werkzeug').setLevel(logging.WARNING if log_level > logging.DEBUG else logging.DEBUG)
+    # httpx (ASGI mode) logs every upstream request at INFO
+    logging.getLogger('httpx').setLevel(logging.WARNING if log_level > logging.DEBUG else logging.DEBUG)
 
     # Blueprints
     from .routes.photobooth import bp as photobooth_bp
     from .routes.settings import bp as settings_bp
     from .routes.gallery import bp as gallery_bp
     from .routes.tts import bp as tts_bp
+    from .routes.metrics import bp as metrics_bp
 
     app.register_blueprint(photobooth_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(gallery_bp)
     app.register_blueprint(tts_bp)
+    app.register_blueprint(metrics_bp)
 
     # Respect X-Forwarded-* when behind nginx
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1)
     return app
 
 
-# Flask CLI entry
-app = create_app()
+_app: Optional['Flask'] = None
+
+
+def __getattr__(name: str) -> 'Flask':
+    """Flask CLI / gunicorn entry (``app:app``), built on first access rather than on import"""
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        _app = create_app()
+    return _app
@@ -0,0 +1,240 @@
+"""ASGI entry point: the upstream-bound TTS and Ollama routes run on the event loop.
+
+Every other route is the Flask app, called on a thread pool, so uploads and
+compositing behave as under gunicorn. Run with:
+
+    uvicorn app.asgi:app --host 0.0.0.0 --port 5000 --workers 2 --proxy-headers --forwarded-allow-ips '*'
+"""
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+from a2wsgi import WSGIMiddleware
+from flask import Flask
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+
+from . import app as default_flask_app
+from .routes.tts import (
+    TTS_SERVICES, PromptStream, TTSError, audio_headers, check_upstream, failover_chain, piper_audio, record_upstream,
+    upstream_request,
+)
+from .services.http_client import async_timeout, close_async_client, get_async_client
+from .services.ollama_service import AsyncOllamaService
+from .services.prompt_pool import get_prompt_pool
+from .services.single_flight import get_single_flight
+from .services.tts_cache import cache_key, get_tts_cache
+from .services.tts_failover import first_success_async
+from .utils.metrics import HTTP_REQUEST_SECONDS, TTS_REQUESTS
+from .utils.settings_store import SettingsStore
+
+logger = logging.getLogger(__name__)
+
+# Threads running Flask requests (uploads, pages, settings) in each worker
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16') or 16)
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def _timed(handler: Handler) -> Handler:
+    """Record request latency under the same endpoint name as the Flask route"""
+    async def wrapper(request: Request) -> Response:
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=f"tts.{handler.__name__}", method=request.method, status=str(status))
+    return wrapper
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> Starlette:
+    """Wrap a Flask app so the TTS and Ollama routes are served asynchronously"""
+    flask_app = flask_app or default_flask_app
+    config = flask_app.config
+
+    def settings() -> Mapping[str, Any]:
+        return SettingsStore(config['SETTINGS_PATH']).snapshot()
+
+    def ollama_config() -> Mapping[str, Any]:
+        return settings().get('ollama', {})
+
+    async def synthesize(service: str, text: str, voice: str) -> bytes:
+        if service == 'piper':
+            # CPU-bound: keep it off the event loop
+            return await run_in_threadpool(piper_audio, config['PIPER_MODELS_FOLDER'], text, voice)
+        upstream = upstream_request(service, text, voice, settings().get('tts', {}))
+        read_timeout = upstream.pop('read_timeout')
+        if 'data' in upstream:
+            upstream['content'] = upstream.pop('data')
+        response = await get_async_client().request(timeout=async_timeout(read_timeout), **upstream)
+        check_upstream(service, response.status_code, response.text)
+        return response.content
+
+    async def tts_speak(request: Request) -> Response:
+        text = request.query_params.get('text', 'Hello')
+        service = request.query_params.get('service', 'google')
+        voice = request.query_params.get('voice', '')
+
+        if not text:
+            return JSONResponse({"error": "Text parameter is required"}, status_code=400)
+        if service not in TTS_SERVICES:
+            return JSONResponse({"error": f"Unknown service: {service}"}, status_code=400)
+
+        key = cache_key(service, voice, text)
+        if key in parse_etags(request.headers.get('if-none-match')):
+            TTS_REQUESTS.inc(service=service, result='not_modified')
+            _, headers = audio_headers(b'', key)
+            return Response(status_code=304, headers=headers)
+
+        cache = get_tts_cache(config['TTS_CACHE_FOLDER'])
+        audio = await run_in_threadpool(cache.get, key)
+        if audio is not None:
+            TTS_REQUESTS.inc(service=service, result='cache_hit')
+            mimetype, headers = audio_headers(audio, key)
+            return Response(audio, media_type=mimetype, headers=headers)
+
+        async def fetch(candidate: str, candidate_voice: str) -> bytes:
+            candidate_key = cache_key(candidate, candidate_voice, text)
+            cached = await run_in_threadpool(cache.get, candidate_key)
+            if cached is not None:
+                return cached
+
+            async def synthesize_and_cache() -> bytes:
+                start = time.perf_counter()
+                try:
+                    audio = await synthesize(candidate, text, candidate_voice)
+                except Exception as e:
+                    record_upstream(candidate, time.perf_counter() - start, e)
+                    raise
+                record_upstream(candidate, time.perf_counter() - start)
+                await run_in_threadpool(cache.put, candidate_key, audio)
+                return audio
+
+            return await get_single_flight('tts').do_async(candidate_key, synthesize_and_cache)
+
+        # Lists installed Piper voices from disk
+        chain = await run_in_threadpool(failover_chain, service, voice, settings().get('tts', {}), config['PIPER_MODELS_FOLDER'])
+        try:
+            (served, served_voice), audio = await first_success_async(chain, fetch)
+        except TTSError as e:
+            TTS_REQUESTS.inc(service=service, result='error')
+            return JSONResponse({"error": e.message, "fallback": "browser"}, status_code=e.status)
+        except Exception as e:
+            logger.error(f"TTS error for {service}: {str(e)}")
+            TTS_REQUESTS.inc(service=service, result='error')
+            return JSONResponse({"error": f"TTS service error: {str(e)}", "fallback": "browser"}, status_code=503)
+
+        if served == service:
+            TTS_REQUESTS.inc(service=service, result='synthesized')
+            mimetype, headers = audio_headers(audio, key)
+        else:
+            TTS_REQUESTS.inc(service=service, result='failover')
+            logger.info(f"TTS for {service} answered by {served}")
+            mimetype, headers = audio_headers(audio, cache_key(served, served_voice, text), served=served)
+        return Response(audio, media_type=mimetype, headers=headers)
+
+    async def list_ollama_models(request: Request) -> Response:
+        ollama = ollama_config()
+        if not ollama.get('enabled', False):
+            return JSONResponse({"error": "Ollama is not enabled"}, status_code=400)
+        if not ollama.get('url', ''):
+            return JSONResponse({"error": "Ollama URL not configured"}, status_code=400)
+        models = await AsyncOllamaService(ollama['url'], ollama.get('api_key', '')).list_models_async()
+        return JSONResponse({"models": models})
+
+    async def generate_ollama_prompt(request: Request) -> Response:
+        ollama = ollama_config()
+        if not ollama.get('enabled', False):
+            return JSONResponse({"error": "Ollama is not enabled"}, status_code=400)
+        url = ollama.get('url', '')
+        if not url:
+            return JSONResponse({"error": "Ollama URL not configured"}, status_code=400)
+
+        api_key = ollama.get('api_key', '')
+        model = ollama.get('model', '')
+        context = ''
+        if request.headers.get('content-type', '').startswith('application/json'):
+            try:
+                context = (await request.json() or {}).get('context', '')
+            except ValueError:
+                pass
+
+        service = AsyncOllamaService(url, api_key)
+        pool_size = int(ollama.get('pool_size', 5) or 0)
+        if pool_size > 0:
+            # The pool refills on its own threads; popping never waits on Ollama
+            prompt = get_prompt_pool(url, api_key, model, context, target_depth=pool_size).pop()
+            source = 'pool'
+            if prompt is None:
+                prompt = service._get_fallback_prompt()
+                source = 'fallback'
+        elif not service.health.available():
+            prompt = service._get_fallback_prompt()
+            source = 'fallback'
+        else:
+            prompt = await service.generate_prompt_async(model, context)
+            source = 'ollama'
+
+        return JSONResponse({
+            "status": "success",
+            "prompt": prompt,
+            "model": model or "auto-selected",
+            "source": source
+        })
+
+    async def stream_ollama_prompt(request: Request) -> Response:
+        ollama = ollama_config()
+        if not ollama.get('enabled', False):
+            return JSONResponse({"error": "Ollama is not enabled"}, status_code=400)
+        url = ollama.get('url', '')
+        if not url:
+            return JSONResponse({"error": "Ollama URL not configured"}, status_code=400)
+
+        service = AsyncOllamaService(url, ollama.get('api_key', ''))
+        model = ollama.get('model', '')
+        context = request.query_params.get('context', '')
+
+        async def events():
+            stream = PromptStream(service)
+            try:
+                async for chunk in service.stream_prompt_async(model, context):
+                    for event in stream.feed(chunk):
+                        yield event
+            except Exception as e:
+                logger.error(f"Ollama prompt stream failed: {str(e)}")
+            for event in stream.finish():
+                yield event
+
+        return StreamingResponse(
+            events(),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        yield
+        await close_async_client()
+
+    return Starlette(
+        routes=[
+            Route('/api/tts/speak', _timed(tts_speak), methods=['GET']),
+            Route('/api/ollama/models', _timed(list_ollama_models), methods=['GET']),
+            Route('/api/ollama/generate-prompt', _timed(generate_ollama_prompt), methods=['POST']),
+            Route('/api/ollama/generate-prompt/stream', _timed(stream_ollama_prompt), methods=['GET']),
+            Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_asgi_app()
@@ -1,25 +1,85 @@
 import os
-from typing import List
+from typing import Any, Dict
+import click
 from flask import Blueprint, current_app, render_template, jsonify, request, url_for
 
 from ..utils.settings_store import SettingsStore
-from ..services.email_service import send_email_smtp
-from ..services.sms_service import SMSGateClient
+from ..services.share_queue import get_share_dispatcher
+from ..services.photo_index import get_photo_index
 
 bp = Blueprint('gallery', __name__)
 
 
-def _list_photos(folder: str) -> List[str]:
-    if not os.path.exists(folder):
-        return []
-    return sorted([f for f in os.listdir(folder) if f.lower().endswith('.png') or f.lower().endswith('.jpg')])
+GALLERY_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 200
+
+
+def _photo_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    filename = row['filename']
+    return {
+        **row,
+        "url": url_for('photobooth.get_photo', filename=filename),
+        "thumb_url": url_for('photobooth.get_photo_derivative', size='thumb', filename=filename),
+        "medium_url": url_for('photobooth.get_photo_derivative', size='medium', filename=filename),
+    }
 
 
 @bp.get('/gallery')
 def gallery():
-    photos = _list_photos(current_app.config['PHOTOS_FOLDER'])
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
-    return render_template('gallery.html', photos=photos, settings=settings)
+    index = get_photo_index(current_app.config['PHOTOS_FOLDER'])
+    photos = [row['filename'] for row in index.page(limit=GALLERY_PAGE_SIZE)]
+    next_cursor = photos[-1] if len(photos) == GALLERY_PAGE_SIZE else None
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
+    return render_template('gallery.html', photos=photos, next_cursor=next_cursor, settings=settings)
+
+
+@bp.get('/api/photos')
+def list_photos():
+    """Cursor-paginated photo listing: pass the previous page's `next` as `after`"""
+    after = request.args.get('after', '')
+    try:
+        limit = max(1, min(MAX_PAGE_SIZE, int(request.args.get('limit', GALLERY_PAGE_SIZE))))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    rows = get_photo_index(current_app.config['PHOTOS_FOLDER']).page(after=after, limit=limit)
+    return jsonify({
+        "photos": [_photo_json(row) for row in rows],
+        "next": rows[-1]['filename'] if len(rows) == limit else None,
+    })
+
+
+@bp.cli.command('reindex')
+def reindex_command():
+    """Reconcile the photo index with the photos folder"""
+    index = get_photo_index(current_app.config['PHOTOS_FOLDER'])
+    added, removed = index.sync(current_app.config['PHOTOS_FOLDER'])
+    measured = index.fill_dimensions(current_app.config['PHOTOS_FOLDER'])
+    click.echo(f"Indexed {index.count()} photo(s): {added} added, {removed} removed, {measured} measured")
+
+
+def _share_dispatcher():
+    return get_share_dispatcher(
+        current_app.config['SHARE_QUEUE_PATH'],
+        current_app.config['SETTINGS_PATH'],
+        current_app.config['PHOTOS_FOLDER'],
+    )
+
+
+@bp.before_app_request
+def _start_share_dispatcher():
+    # Any request starts this worker's dispatcher so leftover jobs drain after a restart
+    _share_dispatcher()
+
+
+def _queued(job_id: int):
+    _share_dispatcher().wake()
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status": "pending",
+        "status_url": url_for('gallery.share_job_status', job_id=job_id),
+    }), 202
 
 
 @bp.post('/api/share/email')
@@ -30,25 +90,11 @@ def share_email():
     if not filename or not to_email:
         return jsonify({"error": "Missing filename or email"}), 400
 
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
-    photo_path = os.path.join(current_app.config['PHOTOS_FOLDER'], filename)
+    if os.path.basename(filename) != filename or not os.path.exists(os.path.join(current_app.config['PHOTOS_FOLDER'], filename)):
+        return jsonify({"error": "Photo not found"}), 404
 
-    try:
-        send_email_smtp(
-            host=settings['smtp']['host'],
-            port=int(settings['smtp']['port']),
-            user=settings['smtp']['user'],
-            password=settings['smtp']['password'],
-            from_email=settings['smtp']['from_email'] or settings['smtp']['user'],
-            to_email=to_email,
-            subject='Your PhotoBooth Photo',
-            body='Attached is your photobooth photo. Have fun!',
-            attachment_path=photo_path,
-        )
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-    return jsonify({"ok": True})
+    job_id = _share_dispatcher().queue.enqueue('email', {"filename": filename, "email": to_email})
+    return _queued(job_id)
 
 
 @bp.post('/api/share/sms')
@@ -59,19 +105,23 @@ def share_sms():
     if not filename or not phone:
         return jsonify({"error": "Missing filename or phone"}), 400
 
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
     # Send direct link to the photo
     photo_url = request.host_url.rstrip('/') + url_for('photobooth.get_photo', filename=filename)
     message = f"Your photobooth photo: {photo_url}"
 
-    try:
-        client = SMSGateClient(
-            api_base=settings['sms']['api_base'],
-            username=settings['sms']['username'],
-            password=settings['sms']['password'],
-        )
-        client.send_sms(message=message, phone_numbers=[phone])
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-    return jsonify({"ok": True})
+    job_id = _share_dispatcher().queue.enqueue('sms', {"filename": filename, "phone": phone, "message": message})
+    return _queued(job_id)
+
+
+@bp.get('/api/share/jobs/<int:job_id>')
+def share_job_status(job_id: int):
+    job = _share_dispatcher().queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({
+        "job_id": job['id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "attempts": job['attempts'],
+        "error": job['last_error'],
+    })
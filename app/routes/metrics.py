@@ -0,0 +1,31 @@
+import time
+from flask import Blueprint, Response, g, request
+
+from ..utils.metrics import HTTP_REQUEST_SECONDS, registry
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.before_app_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@bp.after_app_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Streamed bodies (prompt streams) are timed until their headers are ready
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=str(response.status_code),
+        )
+    return response
+
+
+@bp.get('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; totals cover every gunicorn worker"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,16 +1,28 @@
 import os
 import io
 import base64
-import time
-from datetime import datetime
-from typing import List
-from flask import Blueprint, current_app, render_template, request, jsonify, send_from_directory
+import mimetypes
+from typing import List, Optional
+from urllib.parse import quote
+import click
+from flask import Blueprint, current_app, render_template, request, jsonify, send_file, url_for, abort, Response
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
 from PIL import Image
 
 from ..utils.settings_store import SettingsStore
+from ..utils.image_encoder import MEDIA_EXTENSIONS
+from ..services.photo_pipeline import photo_pipeline, QueueFullError, JOB_ID_PATTERN
+from ..services.burst import BURST_MODES, MAX_BURST_FRAMES, ffmpeg_available
+from ..services.derivatives import ensure_derivative, backfill
 
 bp = Blueprint('photobooth', __name__)
 
+# Photos and their derivatives are written once under a unique name
+PHOTO_CACHE_SECONDS = 365 * 24 * 3600
+# Legacy kiosks use the filename right away, so /api/upload_photo waits for the job this long
+LEGACY_UPLOAD_WAIT = 30.0
+
 
 def _list_frames(folder: str) -> List[str]:
     if not os.path.exists(folder):
@@ -25,9 +37,49 @@ def index():
     return render_template('photobooth.html', frames=frames, settings=settings)
 
 
+ALLOWED_UPLOAD_TYPES = {'image/jpeg', 'image/webp', 'image/png'}
+
+
+def _queue_photo(image_bytes: bytes, frame_name: str, wait: float = 0):
+    # Only the header is parsed here; decoding happens on the pipeline pool
+    try:
+        Image.open(io.BytesIO(image_bytes))
+    except Exception as e:
+        return jsonify({"error": f"Invalid image: {str(e)}"}), 400
+
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
+    try:
+        job = photo_pipeline.submit(
+            image_bytes,
+            frame_name,
+            upload_folder=current_app.config['UPLOAD_FOLDER'],
+            photos_folder=current_app.config['PHOTOS_FOLDER'],
+            photo_settings=settings.get('photos', {}),
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    if wait:
+        job = photo_pipeline.wait(job['job_id'], wait) or job
+        if job['status'] == 'done':
+            return jsonify({"filename": job['filename']})
+        if job['status'] == 'error':
+            return jsonify({"error": f"Failed to process photo: {job['error']}"}), 500
+        # Still running after the wait: answer like the binary endpoint
+    return _job_accepted(job)
+
+
+def _job_accepted(job):
+    return jsonify({
+        "job_id": job['job_id'],
+        "filename": job['filename'],
+        "status": job['status'],
+        "status_url": url_for('photobooth.photo_job_status', job_id=job['job_id']),
+    }), 202
+
+
 @bp.post('/api/upload_photo')
 def upload_photo():
-    # Receives base64 image from client
+    # Receives base64 image from client (legacy kiosks); answers once the photo is saved
     data_url = request.json.get('image')
     frame_name = request.json.get('frame')
     if not data_url or not frame_name:
@@ -35,24 +87,133 @@ def upload_photo():
 
     header, encoded = data_url.split(',', 1)
     image_bytes = base64.b64decode(encoded)
-    image = Image.open(io.BytesIO(image_bytes)).convert('RGBA')
+    return _queue_photo(image_bytes, frame_name, wait=LEGACY_UPLOAD_WAIT)
+
+
+@bp.post('/api/upload_photo/binary')
+def upload_photo_binary():
+    """Receive a raw image Blob (or multipart file) and queue it for processing"""
+    frame_name = request.args.get('frame', '')
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        if upload is None:
+            return jsonify({"error": "Missing image"}), 400
+        frame_name = request.form.get('frame', frame_name)
+        mimetype, stream = upload.mimetype, upload.stream
+    else:
+        mimetype, stream = request.mimetype, request.stream
+
+    if mimetype not in ALLOWED_UPLOAD_TYPES:
+        return jsonify({"error": f"Unsupported image type: {mimetype}"}), 415
 
-    # Composite with selected frame server-side to ensure consistency
-    frame_path = os.path.join(current_app.config['UPLOAD_FOLDER'], frame_name)
-    if os.path.exists(frame_path):
-        frame_img = Image.open(frame_path).convert('RGBA')
-        frame_img = frame_img.resize(image.size, Image.LANCZOS)
-        image = Image.alpha_composite(image, frame_img)
+    return _queue_photo(stream.read(), frame_name)
 
-    # Save photo
-    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"photo_{ts}.png"
-    save_path = os.path.join(current_app.config['PHOTOS_FOLDER'], filename)
-    image.save(save_path, format='PNG')
 
-    return jsonify({"filename": filename})
+@bp.post('/api/upload_burst')
+def upload_burst():
+    """Receive several multipart ``images`` and queue them as one strip or animation"""
+    mode = request.form.get('mode') or request.args.get('mode', 'gif')
+    frame_name = request.form.get('frame') or request.args.get('frame', '')
+    uploads = request.files.getlist('images')
+
+    if mode not in BURST_MODES:
+        return jsonify({"error": f"Unknown mode: {mode}"}), 400
+    if mode == 'mp4' and not ffmpeg_available():
+        return jsonify({"error": "Video mode needs ffmpeg on the server"}), 501
+    if not 2 <= len(uploads) <= MAX_BURST_FRAMES:
+        return jsonify({"error": f"Send between 2 and {MAX_BURST_FRAMES} images"}), 400
+
+    frames = []
+    for upload in uploads:
+        if upload.mimetype not in ALLOWED_UPLOAD_TYPES:
+            return jsonify({"error": f"Unsupported image type: {upload.mimetype}"}), 415
+        data = upload.stream.read()
+        try:
+            Image.open(io.BytesIO(data))
+        except Exception as e:
+            return jsonify({"error": f"Invalid image: {str(e)}"}), 400
+        frames.append(data)
+
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
+    try:
+        job = photo_pipeline.submit_burst(
+            frames,
+            frame_name,
+            mode,
+            upload_folder=current_app.config['UPLOAD_FOLDER'],
+            photos_folder=current_app.config['PHOTOS_FOLDER'],
+            photo_settings=settings.get('photos', {}),
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    return _job_accepted(job)
+
+
+@bp.get('/api/photo_jobs/<job_id>')
+def photo_job_status(job_id: str):
+    if not JOB_ID_PATTERN.match(job_id):
+        return jsonify({"error": "Invalid job id"}), 400
+    job = photo_pipeline.status(job_id, current_app.config['PHOTOS_FOLDER'])
+    if job is None:
+        # Not queued by any worker, or expired long ago
+        return jsonify({"job_id": job_id, "status": "error", "error": "Unknown photo job"}), 404
+    return jsonify({
+        "job_id": job['job_id'],
+        "filename": job['filename'],
+        "status": job['status'],
+        "error": job['error'],
+    })
+
+
+def _send_photo_file(path: str, mimetype: Optional[str] = None):
+    """Serve a file under PHOTOS_FOLDER as an immutable resource.
+
+    With PHOTOS_ACCEL_PREFIX set the route only decides access and nginx sends
+    the bytes (and answers conditional requests) via X-Accel-Redirect.
+    """
+    accel_prefix = current_app.config.get('PHOTOS_ACCEL_PREFIX')
+    if accel_prefix:
+        relative = os.path.relpath(path, current_app.config['PHOTOS_FOLDER']).replace(os.sep, '/')
+        response = Response(mimetype=mimetype or mimetypes.guess_type(path)[0])
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(relative)}"
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=PHOTO_CACHE_SECONDS)
+    response.cache_control.public = True
+    response.cache_control.max_age = PHOTO_CACHE_SECONDS
+    response.cache_control.immutable = True
+    return response
 
 
 @bp.get('/photos/<path:filename>')
 def get_photo(filename: str):
-    return send_from_directory(current_app.config['PHOTOS_FOLDER'], filename)
+    path = safe_join(current_app.config['PHOTOS_FOLDER'], filename)
+    # Only photos are public; hidden entries (index database, derivatives) are not
+    hidden = any(part.startswith('.') for part in filename.split('/'))
+    if path is None or hidden or not path.lower().endswith(MEDIA_EXTENSIONS) or not os.path.isfile(path):
+        abort(404)
+    return _send_photo_file(path)
+
+
+@bp.get('/photos/<any(thumb, medium):size>/<filename>')
+def get_photo_derivative(size: str, filename: str):
+    """Serve a resized copy of a photo, generating it on first request"""
+    photos_folder = current_app.config['PHOTOS_FOLDER']
+    filename = secure_filename(filename)
+    if not filename.lower().endswith(MEDIA_EXTENSIONS):
+        abort(404)
+    try:
+        path = ensure_derivative(photos_folder, size, filename)
+    except OSError:
+        # Videos only get the thumbnails rendered from their first frame at capture time
+        abort(404)
+    if path is None:
+        abort(404)
+    return _send_photo_file(path, mimetype='image/jpeg')
+
+
+@bp.cli.command('backfill-derivatives')
+def backfill_derivatives_command():
+    """Generate missing gallery thumbnails and medium sizes for existing photos"""
+    count = backfill(current_app.config['PHOTOS_FOLDER'])
+    click.echo(f"Checked derivatives for {count} photo(s)")
@@ -4,7 +4,9 @@ from flask import Blueprint, current_app, render_template, request, redirect, ur
 from werkzeug.utils import secure_filename
 
 from ..utils.settings_store import SettingsStore
+from ..utils.frame_cache import frame_cache
 from ..utils.security import check_admin_password, ensure_csrf_token, validate_csrf
+from .tts import start_tts_warmup
 
 bp = Blueprint('settings', __name__)
 
@@ -60,7 +62,16 @@ def settings_page():
         data['ollama']['url'] = request.form.get('ollama_url', '')
         data['ollama']['model'] = request.form.get('ollama_model', 'llama3.2')
         data['ollama']['api_key'] = request.form.get('ollama_api_key', '')
+        data['ollama']['pool_size'] = int(request.form.get('ollama_pool_size', '5') or 0)
+
+        # Photo output encoding
+        data['photos']['format'] = request.form.get('photo_format', data['photos'].get('format', 'png'))
+        data['photos']['png_compress_level'] = int(request.form.get('photo_png_compress_level', '6') or 6)
+        data['photos']['jpeg_quality'] = int(request.form.get('photo_jpeg_quality', '90') or 90)
+        data['photos']['webp_quality'] = int(request.form.get('photo_webp_quality', '85') or 85)
         store.write(data)
+        # The first guest should not wait for the new prompt or voice to be synthesized
+        start_tts_warmup(data['tts'])
 
         if 'frame' in request.files:
             file = request.files['frame']
@@ -70,6 +81,8 @@ def settings_page():
                 if ext in ALLOWED_FRAME_EXTENSIONS:
                     save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                     file.save(save_path)
+                    frame_cache.invalidate(filename)
+                    frame_cache.warm(current_app.config['UPLOAD_FOLDER'], filename)
 
         return redirect(url_for('settings.settings_page'))
 
@@ -90,4 +103,5 @@ def delete_frame():
         os.remove(path)
     except FileNotFoundError:
         pass
+    frame_cache.invalidate(filename)
     return jsonify({"ok": True})
@@ -1,17 +1,36 @@
 import io
 import os
+import re
+import json
 import time
-import requests
 import urllib.parse
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 from flask import Blueprint, current_app, jsonify, request, Response, send_file
 import logging
 
 from ..utils.settings_store import SettingsStore
-from ..services.ollama_service import OllamaService
+from ..services.ollama_service import FALLBACK_PROMPTS, OllamaService
+from ..services.prompt_pool import get_prompt_pool
+from ..services.single_flight import get_single_flight
+from ..services.tts_cache import TTSCache, cache_key, get_tts_cache
+from ..services.tts_failover import FAILOVER_CHAIN, Candidate, first_success, get_provider_health, provider_status
+from ..services.tts_warmup import get_tts_warmup
+from ..services.http_client import get_session, timeout
+from ..services.piper_service import get_piper_engine, list_voices as list_piper_voices, piper_available, wav_to_mp3
+from ..utils.metrics import TTS_REQUESTS, TTS_UPSTREAM_SECONDS
 
 bp = Blueprint('tts', __name__)
 logger = logging.getLogger(__name__)
 
+# Synthesized clips are immutable per URL, so browsers may keep them for a week
+TTS_BROWSER_CACHE_SECONDS = 7 * 24 * 3600
+
+# What the kiosk counts down with before each shot
+COUNTDOWN_NUMBERS = ['3', '2', '1']
+
+# End of a sentence in streamed text: terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s')
+
 # Free TTS service configurations
 TTS_SERVICES = {
     'google': {
@@ -42,6 +61,11 @@ TTS_SERVICES = {
             'Content-Type': 'application/json'
         },
         'api_key_required': True
+    },
+    'piper': {
+        'name': 'Piper (local, offline)',
+        # Voices are the models installed in PIPER_MODELS_FOLDER
+        'local': True
     }
 }
 
@@ -97,10 +121,13 @@ def list_voices():
     """List available voices for the selected TTS service"""
     service = request.args.get('service', 'google')
     
-    if service not in TTS_VOICES:
+    if service == 'piper':
+        voices = list_piper_voices(current_app.config['PIPER_MODELS_FOLDER'])
+    elif service in TTS_VOICES:
+        voices = TTS_VOICES[service]
+    else:
         return jsonify({"error": f"Unknown service: {service}"}), 400
     
-    voices = TTS_VOICES[service]
     return jsonify({
         "service": service,
         "service_name": TTS_SERVICES[service]['name'],
@@ -121,126 +148,254 @@ def tts_speak():
         return jsonify({"error": f"Unknown service: {service}"}), 400
     
     logger.info(f"TTS request: service={service}, voice={voice}, text_length={len(text)}")
-    
+
+    # The clip for a (service, voice, text) never changes, so its hash is a strong ETag
+    key = cache_key(service, voice, text)
+    if key in request.if_none_match:
+        TTS_REQUESTS.inc(service=service, result='not_modified')
+        return _audio_response(b'', key, status=304)
+
+    cache = get_tts_cache(current_app.config['TTS_CACHE_FOLDER'])
+    audio = cache.get(key)
+    if audio is not None:
+        TTS_REQUESTS.inc(service=service, result='cache_hit')
+        return _audio_response(audio, key)
+
+    config = current_app.config
+    tts_settings = SettingsStore(config['SETTINGS_PATH']).snapshot().get('tts', {})
+
+    def fetch(candidate: str, candidate_voice: str) -> bytes:
+        # Runs on a failover thread, outside the app context
+        candidate_key = cache_key(candidate, candidate_voice, text)
+        cached = cache.get(candidate_key)
+        if cached is not None:
+            return cached
+        # Kiosks counting down together ask for the same clip at the same moment
+        return get_single_flight('tts').do(candidate_key, lambda: _synthesize_and_cache(
+            cache, candidate_key, candidate, text, candidate_voice, tts_settings, config['PIPER_MODELS_FOLDER']))
+
+    chain = failover_chain(service, voice, tts_settings, config['PIPER_MODELS_FOLDER'])
     try:
-        if service == 'google':
-            return _google_tts(text, voice)
-        elif service == 'microsoft':
-            return _microsoft_tts(text, voice)
-        elif service == 'elevenlabs':
-            return _elevenlabs_tts(text, voice)
-        else:
-            return jsonify({"error": f"Unsupported service: {service}"}), 400
-            
+        (served, served_voice), audio = first_success(chain, fetch)
+    except TTSError as e:
+        TTS_REQUESTS.inc(service=service, result='error')
+        return jsonify({"error": e.message, "fallback": "browser"}), e.status
     except Exception as e:
         logger.error(f"TTS error for {service}: {str(e)}")
-        return jsonify({"error": f"TTS service error: {str(e)}"}), 500
+        TTS_REQUESTS.inc(service=service, result='error')
+        return jsonify({"error": f"TTS service error: {str(e)}", "fallback": "browser"}), 503
 
-def _google_tts(text: str, voice: str) -> Response:
-    """Generate speech using Google Translate TTS"""
-    # Clean and truncate text (Google has limits)
-    clean_text = text[:200]  # Google limit
-    
-    params = TTS_SERVICES['google']['params'].copy()
-    params['q'] = clean_text
-    params['tl'] = voice if voice else 'en'
-    
-    url = TTS_SERVICES['google']['url']
-    response = requests.get(url, params=params, timeout=10)
-    
-    if response.status_code != 200:
-        logger.error(f"Google TTS error: {response.status_code}")
-        return jsonify({"error": "Google TTS service unavailable"}), 503
-    
-    # Google returns MP3 directly
-    return Response(
-        response.content,
-        mimetype='audio/mpeg',
-        headers={'Content-Disposition': 'inline; filename=speech.mp3'}
-    )
+    if served == service:
+        TTS_REQUESTS.inc(service=service, result='synthesized')
+        return _audio_response(audio, key)
+    TTS_REQUESTS.inc(service=service, result='failover')
+    logger.info(f"TTS for {service} answered by {served}")
+    mimetype, headers = audio_headers(audio, cache_key(served, served_voice, text), served=served)
+    return Response(audio, mimetype=mimetype, headers=headers)
 
-def _microsoft_tts(text: str, voice: str) -> Response:
-    """Generate speech using Microsoft Cognitive Services TTS"""
-    # Get API key from settings
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
-    api_key = settings.get('tts', {}).get('microsoft_api_key', '')
-    
-    if not api_key:
-        logger.error("Microsoft TTS API key not configured")
-        return jsonify({"error": "Microsoft TTS API key required"}), 400
-    
-    # Clean text and create SSML
-    clean_text = text[:500]  # Microsoft limit
-    
-    # Create SSML with the selected voice
-    ssml = f"""<speak version='1.0' xml:lang='en-US'>
+@bp.get('/api/tts/warmup')
+def tts_warmup_status():
+    """Progress of the clip warm-up started by the last settings change"""
+    return jsonify(get_tts_warmup(current_app.config['TTS_WARMUP_PATH']).status())
+
+def start_tts_warmup(tts_settings: Mapping[str, Any]) -> None:
+    """Pre-synthesize the configured prompt, countdown and fallback prompts for the configured voice"""
+    if not tts_settings.get('enabled') or tts_settings.get('engine') != 'remote':
+        return
+    service = tts_settings.get('service', 'google')
+    voice = tts_settings.get('voice', '')
+    if service not in TTS_SERVICES:
+        return
+
+    config = current_app.config
+    models_dir = config['PIPER_MODELS_FOLDER']
+    cache = get_tts_cache(config['TTS_CACHE_FOLDER'])
+    texts = list(dict.fromkeys(t for t in [tts_settings.get('prompt', ''), *COUNTDOWN_NUMBERS, *FALLBACK_PROMPTS] if t))
+
+    def fetch(text: str) -> bool:
+        key = cache_key(service, voice, text)
+        if cache.get(key) is not None:
+            return False
+        # Shares the call with a kiosk asking for the same clip meanwhile
+        get_single_flight('tts').do(key, lambda: _synthesize_and_cache(cache, key, service, text, voice, tts_settings, models_dir))
+        return True
+
+    get_tts_warmup(config['TTS_WARMUP_PATH']).start(service, voice, texts, fetch)
+
+@bp.get('/api/tts/health')
+def tts_health():
+    """Rolling latency, error rate and breaker state of each TTS provider in this worker"""
+    return jsonify({"providers": provider_status(), "chain": FAILOVER_CHAIN})
+
+def failover_chain(service: str, voice: str, tts_settings: Mapping[str, Any], models_dir: str) -> List[Candidate]:
+    """The requested provider followed by configured fallbacks, each with a voice in the same language"""
+    chain = [(service, voice)]
+    language = _voice_language(service, voice)
+    for other in FAILOVER_CHAIN:
+        if other == service or other not in TTS_SERVICES:
+            continue
+        if TTS_SERVICES[other].get('api_key_required') and not tts_settings.get(f"{other}_api_key"):
+            continue
+        other_voice = _fallback_voice(other, language, models_dir)
+        if other_voice is not None:
+            chain.append((other, other_voice))
+    return chain
+
+def _voice_language(service: str, voice: str) -> str:
+    if service == 'google':
+        return voice or 'en'
+    if service in ('microsoft', 'piper') and voice:
+        # en-US-JennyNeural, en_US-lessac-medium
+        return re.split(r'[-_]', voice)[0]
+    return 'en'
+
+def _fallback_voice(service: str, language: str, models_dir: str) -> Optional[str]:
+    """A voice for ``language`` on another provider, or None if it has none"""
+    if service == 'google':
+        return language if any(v['id'] == language for v in TTS_VOICES['google']) else None
+    if service == 'microsoft':
+        return next((v['id'] for v in TTS_VOICES['microsoft'] if v['id'].startswith(f"{language}-")), None)
+    if service == 'elevenlabs':
+        # The default ElevenLabs model only speaks English
+        return '' if language == 'en' else None
+    if service == 'piper':
+        if not piper_available():
+            return None
+        return next((v['id'] for v in list_piper_voices(models_dir) if v['id'].startswith(language)), None)
+    return None
+
+def _synthesize_and_cache(cache: TTSCache, key: str, service: str, text: str, voice: str,
+                          tts_settings: Mapping[str, Any], models_dir: str) -> bytes:
+    start = time.perf_counter()
+    try:
+        audio = _synthesize(service, text, voice, tts_settings, models_dir)
+    except Exception as e:
+        record_upstream(service, time.perf_counter() - start, e)
+        raise
+    record_upstream(service, time.perf_counter() - start)
+    cache.put(key, audio)
+    return audio
+
+def record_upstream(service: str, elapsed: float, error: Optional[BaseException] = None) -> None:
+    """Report one synthesis to the metrics and to the provider's circuit breaker"""
+    TTS_UPSTREAM_SECONDS.observe(elapsed, service=service, outcome='error' if error else 'ok')
+    # A missing API key says nothing about the provider's health
+    if isinstance(error, TTSError) and error.status == 400:
+        return
+    get_provider_health(service).record(elapsed, error is None, str(error) if error else '')
+
+def _audio_response(audio: bytes, etag: str, status: int = 200) -> Response:
+    mimetype, headers = audio_headers(audio, etag)
+    return Response(audio, status=status, mimetype=mimetype, headers=headers)
+
+def audio_headers(audio: bytes, etag: str, served: str = '') -> Tuple[str, Dict[str, str]]:
+    """Mimetype and caching headers for a synthesized clip.
+
+    ``served`` names the fallback provider when it is not the one requested;
+    that clip must not be cached as the answer for this URL.
+    """
+    # Everything is MP3 except Piper output on hosts without ffmpeg
+    is_wav = audio[:4] == b'RIFF'
+    headers = {
+        'Content-Disposition': f"inline; filename=speech.{'wav' if is_wav else 'mp3'}",
+        'ETag': f'"{etag}"',
+        'Cache-Control': f"public, max-age={TTS_BROWSER_CACHE_SECONDS}, immutable",
+    }
+    if served:
+        headers['Cache-Control'] = 'no-cache'
+        headers['X-TTS-Service'] = served
+    return 'audio/wav' if is_wav else 'audio/mpeg', headers
+
+class TTSError(Exception):
+    """A TTS request that failed in an expected way (missing key, upstream error)"""
+
+    def __init__(self, message: str, status: int = 503) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def _synthesize(service: str, text: str, voice: str, tts_settings: Mapping[str, Any], models_dir: str) -> bytes:
+    if service == 'piper':
+        return piper_audio(models_dir, text, voice)
+    upstream = upstream_request(service, text, voice, tts_settings)
+    read_timeout = upstream.pop('read_timeout')
+    response = get_session().request(timeout=timeout(read_timeout), **upstream)
+    check_upstream(service, response.status_code, response.text)
+    # All remote services return MP3 directly
+    return response.content
+
+def upstream_request(service: str, text: str, voice: str, tts_settings: Mapping[str, Any]) -> Dict[str, Any]:
+    """Build the HTTP request for a remote TTS service (usable with requests or httpx)"""
+    config = TTS_SERVICES[service]
+    if service == 'google':
+        params = dict(config['params'])
+        params['q'] = text[:200]  # Google limit
+        params['tl'] = voice if voice else 'en'
+        return {'method': 'GET', 'url': config['url'], 'params': params, 'read_timeout': 10}
+
+    if service == 'microsoft':
+        api_key = tts_settings.get('microsoft_api_key', '')
+        if not api_key:
+            logger.error("Microsoft TTS API key not configured")
+            raise TTSError("Microsoft TTS API key required", 400)
+        # Create SSML with the selected voice
+        ssml = f"""<speak version='1.0' xml:lang='en-US'>
         <voice xml:lang='en-US' xml:gender='neutral' name='{voice}'>
-            {clean_text}
+            {text[:500]}
         </voice>
     </speak>"""
-    
-    url = TTS_SERVICES['microsoft']['url']
-    headers = TTS_SERVICES['microsoft']['headers'].copy()
-    headers['Ocp-Apim-Subscription-Key'] = api_key
-    
-    try:
-        response = requests.post(url, data=ssml, headers=headers, timeout=15)
-        
-        if response.status_code != 200:
-            logger.error(f"Microsoft TTS error: {response.status_code} - {response.text}")
-            return jsonify({"error": "Microsoft TTS service error"}), 503
-        
-        # Microsoft returns MP3 directly
-        return Response(
-            response.content,
-            mimetype='audio/mpeg',
-            headers={'Content-Disposition': 'inline; filename=speech.mp3'}
-        )
-    except Exception as e:
-        logger.error(f"Microsoft TTS request failed: {str(e)}")
-        return jsonify({"error": "Microsoft TTS service unavailable"}), 503
+        headers = dict(config['headers'])
+        headers['Ocp-Apim-Subscription-Key'] = api_key
+        return {'method': 'POST', 'url': config['url'], 'data': ssml.encode('utf-8'), 'headers': headers, 'read_timeout': 15}
 
-def _elevenlabs_tts(text: str, voice: str) -> Response:
-    """Generate speech using ElevenLabs API (requires API key)"""
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
-    api_key = settings.get('tts', {}).get('elevenlabs_api_key', '')
-    
-    if not api_key:
-        logger.error("ElevenLabs API key not configured")
-        return jsonify({"error": "ElevenLabs API key required"}), 400
-    
-    # Clean text
-    clean_text = text[:2500]  # ElevenLabs limit
-    
-    # Use default voice if none specified
-    if not voice:
-        voice = '21m00Tcm4TlvDq8ikWAM'  # Rachel
-    
-    url = f"{TTS_SERVICES['elevenlabs']['url']}/{voice}"
-    headers = TTS_SERVICES['elevenlabs']['headers'].copy()
-    headers['xi-api-key'] = api_key
-    
-    data = {
-        "text": clean_text,
-        "model_id": "eleven_monolingual_v1",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.5
+    if service == 'elevenlabs':
+        api_key = tts_settings.get('elevenlabs_api_key', '')
+        if not api_key:
+            logger.error("ElevenLabs API key not configured")
+            raise TTSError("ElevenLabs API key required", 400)
+        headers = dict(config['headers'])
+        headers['xi-api-key'] = api_key
+        data = {
+            "text": text[:2500],  # ElevenLabs limit
+            "model_id": "eleven_monolingual_v1",
+            "voice_settings": {
+                "stability": 0.5,
+                "similarity_boost": 0.5
+            }
         }
-    }
-    
-    response = requests.post(url, json=data, headers=headers, timeout=30)
-    
-    if response.status_code != 200:
-        logger.error(f"ElevenLabs TTS error: {response.status_code} - {response.text}")
-        return jsonify({"error": "ElevenLabs TTS service error"}), 503
-    
-    # ElevenLabs returns MP3 directly
-    return Response(
-        response.content,
-        mimetype='audio/mpeg',
-        headers={'Content-Disposition': 'inline; filename=speech.mp3'}
-    )
+        # Default voice is Rachel
+        return {'method': 'POST', 'url': f"{config['url']}/{voice or '21m00Tcm4TlvDq8ikWAM'}", 'json': data, 'headers': headers, 'read_timeout': 30}
+
+    raise TTSError(f"Unsupported service: {service}", 400)
+
+def check_upstream(service: str, status_code: int, body: str) -> None:
+    if status_code != 200:
+        name = TTS_SERVICES[service]['name']
+        logger.error(f"{name} error: {status_code} - {body[:200]}")
+        raise TTSError(f"{name} service unavailable")
+
+def piper_audio(models_dir: str, text: str, voice: str) -> bytes:
+    """Synthesize locally with a Piper voice model; MP3 when ffmpeg is available, else WAV"""
+    if not piper_available():
+        raise TTSError("Piper is not installed on the server")
+
+    engine = get_piper_engine(models_dir)
+    if engine.model_path(voice) is None:
+        installed = list_piper_voices(models_dir)
+        if not installed:
+            raise TTSError("No Piper voices installed")
+        # Settings may still hold another service's voice id
+        voice = installed[0]['id']
+
+    wav = engine.synthesize(voice, text[:2500])
+    return wav_to_mp3(wav) or wav
+
+@bp.before_app_request
+def _preload_piper_voice():
+    # Load the configured voice before the first countdown needs it
+    tts = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot().get('tts', {})
+    if tts.get('service') == 'piper' and tts.get('voice'):
+        get_piper_engine(current_app.config['PIPER_MODELS_FOLDER']).preload(tts['voice'])
 
 @bp.get('/api/tts/services')
 def list_services():
@@ -250,7 +405,8 @@ def list_services():
         services.append({
             'id': key,
             'name': service['name'],
-            'api_key_required': service.get('api_key_required', False)
+            'api_key_required': service.get('api_key_required', False),
+            'local': service.get('local', False)
         })
     return jsonify({"services": services})
 
@@ -258,7 +414,7 @@ def list_services():
 @bp.get('/api/ollama/models')
 def list_ollama_models():
     """List available Ollama models"""
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
     ollama_config = settings.get('ollama', {})
     
     if not ollama_config.get('enabled', False):
@@ -281,7 +437,7 @@ def list_ollama_models():
 @bp.post('/api/ollama/test')
 def test_ollama_connection():
     """Test Ollama connection"""
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
     ollama_config = settings.get('ollama', {})
     
     if not ollama_config.get('enabled', False):
@@ -306,10 +462,27 @@ def test_ollama_connection():
         logger.error(f"Ollama connection test failed: {str(e)}")
         return jsonify({"status": "error", "message": f"Connection test failed: {str(e)}"}), 500
 
+@bp.get('/api/ollama/health')
+def ollama_health():
+    """Circuit-breaker state and model catalog age for the configured Ollama server"""
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
+    ollama_config = settings.get('ollama', {})
+
+    if not ollama_config.get('enabled', False):
+        return jsonify({"error": "Ollama is not enabled"}), 400
+
+    url = ollama_config.get('url', '')
+    if not url:
+        return jsonify({"error": "Ollama URL not configured"}), 400
+
+    # Starts the background probe if this worker has not used Ollama yet
+    service = OllamaService(url, ollama_config.get('api_key', ''))
+    return jsonify(service.health.status())
+
 @bp.post('/api/ollama/generate-prompt')
 def generate_ollama_prompt():
     """Generate a photobooth prompt using Ollama"""
-    settings = SettingsStore(current_app.config['SETTINGS_PATH']).read()
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
     ollama_config = settings.get('ollama', {})
     
     if not ollama_config.get('enabled', False):
@@ -327,16 +500,98 @@ def generate_ollama_prompt():
     
     try:
         service = OllamaService(url, api_key)
-        prompt = service.generate_prompt(model, context)
+        pool_size = int(ollama_config.get('pool_size', 5) or 0)
+        if pool_size > 0:
+            # Serve a pre-generated prompt; the pool refills itself in the background
+            prompt = get_prompt_pool(url, api_key, model, context, target_depth=pool_size).pop()
+            source = 'pool'
+            if prompt is None:
+                prompt = service._get_fallback_prompt()
+                source = 'fallback'
+        elif not service.health.available():
+            prompt = service._get_fallback_prompt()
+            source = 'fallback'
+        else:
+            prompt = service.generate_prompt(model, context)
+            source = 'ollama'
         
         return jsonify({
             "status": "success",
             "prompt": prompt,
-            "model": model or "auto-selected"
+            "model": model or "auto-selected",
+            "source": source
         })
         
     except Exception as e:
         logger.error(f"Failed to generate Ollama prompt: {str(e)}")
         return jsonify({"error": f"Failed to generate prompt: {str(e)}"}), 500
 
+@bp.get('/api/ollama/generate-prompt/stream')
+def stream_ollama_prompt():
+    """Stream a prompt as Server-Sent Events while Ollama generates it.
+
+    Emits `token` events for each chunk, a `sentence` event for every complete
+    sentence (so the browser can start TTS early) and a final `done` event.
+    """
+    settings = SettingsStore(current_app.config['SETTINGS_PATH']).snapshot()
+    ollama_config = settings.get('ollama', {})
+
+    if not ollama_config.get('enabled', False):
+        return jsonify({"error": "Ollama is not enabled"}), 400
+
+    url = ollama_config.get('url', '')
+    if not url:
+        return jsonify({"error": "Ollama URL not configured"}), 400
+
+    service = OllamaService(url, ollama_config.get('api_key', ''))
+    model = ollama_config.get('model', '')
+    context = request.args.get('context', '')
+
+    def events():
+        stream = PromptStream(service)
+        try:
+            for chunk in service.stream_prompt(model, context):
+                yield from stream.feed(chunk)
+        except Exception as e:
+            logger.error(f"Ollama prompt stream failed: {str(e)}")
+        yield from stream.finish()
+
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class PromptStream:
+    """Turns streamed prompt text into `token`, `sentence` and `done` SSE events"""
+
+    def __init__(self, service: OllamaService) -> None:
+        self.service = service
+        self.full = ''
+        self.pending = ''
+
+    def feed(self, chunk: str) -> List[str]:
+        self.full += chunk
+        self.pending += chunk
+        events = [_sse('token', {"text": chunk})]
+        match = SENTENCE_END.search(self.pending)
+        while match:
+            sentence = self.pending[:match.end()].strip()
+            self.pending = self.pending[match.end():]
+            if sentence:
+                events.append(_sse('sentence', {"text": self.service.clean_prompt(sentence)}))
+            match = SENTENCE_END.search(self.pending)
+        return events
 
+    def finish(self) -> List[str]:
+        if not self.full.strip():
+            prompt = self.service._get_fallback_prompt()
+            return [_sse('sentence', {"text": prompt}), _sse('done', {"prompt": prompt, "source": "fallback"})]
+        events = []
+        if self.pending.strip():
+            events.append(_sse('sentence', {"text": self.service.clean_prompt(self.pending)}))
+        events.append(_sse('done', {"prompt": self.service.clean_prompt(self.full), "source": "ollama"}))
+        return events
@@ -0,0 +1,179 @@
+import io
+import os
+import math
+import shutil
+import tempfile
+import threading
+import subprocess
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, List, Mapping, Optional
+from PIL import Image
+
+from ..utils.image_encoder import encode_image, file_extension, save_options
+from .compositing import composite
+
+logger = logging.getLogger(__name__)
+
+# Output kinds for a burst: a still grid, or an animation of the frames
+BURST_MODES = ('strip', 'gif', 'webp', 'mp4')
+MAX_BURST_FRAMES = int(os.getenv('BURST_MAX_FRAMES', '8') or 8)
+BURST_PROCESSES = int(os.getenv('BURST_PROCESSES', '0') or 0) or os.cpu_count() or 2
+FRAME_DURATION_MS = int(os.getenv('BURST_FRAME_MS', '500') or 500)
+
+# Longest edge of each frame in animations and of each strip tile
+ANIMATION_MAX_EDGE = 800
+STRIP_TILE_EDGE = 1200
+STRIP_COLUMNS = 2
+STRIP_GAP = 24
+MP4_TIMEOUT = 60
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which('ffmpeg') is not None
+
+
+def burst_extension(mode: str, photo_settings: Mapping[str, Any]) -> str:
+    if mode == 'strip':
+        return file_extension(photo_settings)
+    return f".{mode}"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return this process's compositing pool, created on first use.
+
+    Children are started by a fork server rather than forked from a threaded
+    gunicorn worker, and each keeps its own frame overlay cache. Importing this
+    module does not build the Flask app, so children stay small.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            if context.get_start_method() == 'forkserver':
+                # Children fork from a server that has already imported Pillow and this module
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=BURST_PROCESSES, mp_context=context)
+            _pool_pid = pid
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a pool whose child died, so the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _prepare_frame(image_bytes: bytes, frame_name: str, upload_folder: str, mode: str, frame_path: Optional[str]) -> Image.Image:
+    """Decode, downscale and composite one burst frame (runs in a pool process)"""
+    edge = STRIP_TILE_EDGE if mode == 'strip' else ANIMATION_MAX_EDGE
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft('RGB', (edge, edge))
+    image.thumbnail((edge, edge), Image.LANCZOS)
+    image = composite(image, frame_name, upload_folder).convert('RGB')
+    if frame_path:
+        image.save(frame_path, format='JPEG', quality=92)
+    if mode == 'gif':
+        # Palette reduction is the expensive part of GIF encoding, so it runs here too
+        return image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    return image
+
+
+def _prepare_frames(frames: List[bytes], frame_name: str, upload_folder: str, mode: str, frames_dir: Optional[str]) -> List[Image.Image]:
+    """Run ``_prepare_frame`` for every frame on the pool, retrying once on a new pool if a child died"""
+    def run(pool: ProcessPoolExecutor) -> List[Image.Image]:
+        futures = [
+            pool.submit(
+                _prepare_frame, data, frame_name, upload_folder, mode,
+                os.path.join(frames_dir, f"frame_{i:03d}.jpg") if frames_dir else None,
+            )
+            for i, data in enumerate(frames)
+        ]
+        return [future.result() for future in futures]
+
+    pool = _get_pool()
+    try:
+        return run(pool)
+    except BrokenProcessPool:
+        # A child was killed (e.g. OOM on a huge frame); the executor is unusable from now on
+        logger.warning("Burst process pool broke; retrying on a new pool")
+        _discard_pool(pool)
+    return run(_get_pool())
+
+
+def _strip(images: List[Image.Image]) -> Image.Image:
+    tile_w = max(img.width for img in images)
+    tile_h = max(img.height for img in images)
+    columns = min(STRIP_COLUMNS, len(images))
+    rows = math.ceil(len(images) / columns)
+    sheet = Image.new('RGB', (
+        columns * tile_w + (columns + 1) * STRIP_GAP,
+        rows * tile_h + (rows + 1) * STRIP_GAP,
+    ), 'white')
+    for i, img in enumerate(images):
+        row, col = divmod(i, columns)
+        x = STRIP_GAP + col * (tile_w + STRIP_GAP) + (tile_w - img.width) // 2
+        y = STRIP_GAP + row * (tile_h + STRIP_GAP) + (tile_h - img.height) // 2
+        sheet.paste(img, (x, y))
+    return sheet
+
+
+def _encode_mp4(frames_dir: str, save_path: str) -> None:
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-framerate', f"{1000 / FRAME_DURATION_MS:g}",
+        '-i', os.path.join(frames_dir, 'frame_%03d.jpg'),
+        # H.264 with yuv420p needs even dimensions
+        '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-r', '30',
+        '-movflags', '+faststart', '-f', 'mp4', save_path,
+    ]
+    result = subprocess.run(command, capture_output=True, timeout=MP4_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+
+
+def render_burst(frames: List[bytes], frame_name: str, upload_folder: str, mode: str, save_path: str, photo_settings: Mapping[str, Any]) -> Image.Image:
+    """Composite burst frames in parallel and write the strip or animation atomically.
+
+    Returns a still (the strip, or the first frame) for thumbnails and the index.
+    """
+    if mode not in BURST_MODES:
+        raise ValueError(f"Unknown burst mode: {mode}")
+    if mode == 'mp4' and not ffmpeg_available():
+        raise RuntimeError("ffmpeg is not installed")
+
+    frames_dir = tempfile.mkdtemp(prefix='burst-') if mode == 'mp4' else None
+    try:
+        images = _prepare_frames(frames, frame_name, upload_folder, mode, frames_dir)
+
+        tmp_path = f"{save_path}.tmp"
+        if mode == 'strip':
+            still = _strip(images)
+            encode_image(still, tmp_path, photo_settings)
+        elif mode == 'gif':
+            images[0].save(tmp_path, format='GIF', save_all=True, append_images=images[1:], duration=FRAME_DURATION_MS, loop=0)
+            still = images[0].convert('RGB')
+        elif mode == 'webp':
+            options = save_options({**photo_settings, 'format': 'webp'})
+            images[0].save(tmp_path, save_all=True, append_images=images[1:], duration=FRAME_DURATION_MS, loop=0, **options)
+            still = images[0]
+        else:
+            _encode_mp4(frames_dir, tmp_path)
+            still = images[0]
+        os.replace(tmp_path, save_path)
+        return still
+    finally:
+        if frames_dir:
+            shutil.rmtree(frames_dir, ignore_errors=True)
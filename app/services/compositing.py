@@ -0,0 +1,16 @@
+from PIL import Image
+
+from ..utils.compositor import has_transparency
+from ..utils.frame_cache import frame_cache
+
+
+def composite(image: Image.Image, frame_name: str, upload_folder: str) -> Image.Image:
+    """Return ``image`` with the named frame overlaid, if it exists.
+
+    The result is RGB for opaque camera images and RGBA otherwise.
+    """
+    if frame_name:
+        overlay = frame_cache.get(upload_folder, frame_name, image.size)
+        if overlay is not None:
+            return overlay.apply(image)
+    return image.convert('RGBA') if has_transparency(image) else image.convert('RGB')
@@ -0,0 +1,112 @@
+import os
+import logging
+import threading
+from typing import Dict, Optional
+from PIL import Image
+
+from ..utils.image_encoder import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each derivative size
+DERIVATIVE_SIZES: Dict[str, int] = {
+    'thumb': 320,
+    'medium': 1024,
+    'email': 1600,
+}
+
+# Sizes built eagerly after each capture; others are created on demand
+GALLERY_SIZES = ('thumb', 'medium')
+
+DERIVATIVES_DIRNAME = '.derivatives'
+DERIVATIVE_QUALITY = 82
+
+
+def derivative_path(photos_folder: str, size: str, filename: str) -> str:
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(photos_folder, DERIVATIVES_DIRNAME, size, f"{stem}.jpg")
+
+
+def _is_fresh(path: str, source_mtime: float) -> bool:
+    try:
+        return os.path.getmtime(path) == source_mtime
+    except OSError:
+        return False
+
+
+def _write(image: Image.Image, path: str, source_mtime: float) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(tmp_path, format='JPEG', quality=DERIVATIVE_QUALITY, optimize=True, progressive=True)
+    os.utime(tmp_path, (source_mtime, source_mtime))
+    os.replace(tmp_path, path)
+
+
+def _render(source_path: str, edge: int, source_image: Optional[Image.Image] = None) -> Image.Image:
+    if source_image is not None:
+        image = source_image.copy()
+    else:
+        image = Image.open(source_path)
+        # JPEG sources can be decoded at reduced scale, which is far cheaper
+        image.draft('RGB', (edge, edge))
+    image.thumbnail((edge, edge), Image.LANCZOS)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def ensure_derivative(photos_folder: str, size: str, filename: str, source_image: Optional[Image.Image] = None) -> Optional[str]:
+    """Return the path of an up-to-date derivative, generating it if needed.
+
+    A derivative is stamped with its source's mtime, so regeneration is
+    idempotent and a replaced source is picked up automatically.
+    """
+    if size not in DERIVATIVE_SIZES:
+        return None
+    source_path = os.path.join(photos_folder, filename)
+    try:
+        source_mtime = os.path.getmtime(source_path)
+    except OSError:
+        return None
+
+    path = derivative_path(photos_folder, size, filename)
+    if not _is_fresh(path, source_mtime):
+        _write(_render(source_path, DERIVATIVE_SIZES[size], source_image), path, source_mtime)
+    return path
+
+
+def generate_all(photos_folder: str, filename: str, source_image: Optional[Image.Image] = None) -> None:
+    """Create the gallery derivative sizes for a photo.
+
+    Sizes are rendered largest first and each smaller size is resized from the
+    previous one rather than from the full-resolution photo.
+    """
+    source_path = os.path.join(photos_folder, filename)
+    try:
+        source_mtime = os.path.getmtime(source_path)
+    except OSError:
+        return
+
+    for size in sorted(GALLERY_SIZES, key=DERIVATIVE_SIZES.get, reverse=True):
+        path = derivative_path(photos_folder, size, filename)
+        if _is_fresh(path, source_mtime):
+            continue
+        try:
+            source_image = _render(source_path, DERIVATIVE_SIZES[size], source_image)
+            _write(source_image, path, source_mtime)
+        except Exception as e:
+            logger.error(f"Failed to create {size} derivative for {filename}: {str(e)}")
+
+
+def backfill(photos_folder: str) -> int:
+    """Generate missing or stale derivatives for every photo; returns photos processed"""
+    if not os.path.exists(photos_folder):
+        return 0
+    count = 0
+    for filename in sorted(os.listdir(photos_folder)):
+        # MP4 bursts have no derivatives; Pillow cannot open them
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        generate_all(photos_folder, filename)
+        count += 1
+    return count
@@ -1,12 +1,25 @@
+import os
+import uuid
+import base64
+import socket
 import smtplib
+import mimetypes
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
+from email.generator import BytesGenerator
+from email.message import Message
+from email.policy import compat32
 from email import encoders
-from typing import Optional
+from typing import BinaryIO, Callable, List, Optional
 
+# Bytes buffered before each write to the SMTP socket
+STREAM_CHUNK_SIZE = 64 * 1024
+# Attachment bytes read at a time; a multiple of 57 keeps base64 lines at 76 chars
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
 
-def send_email_smtp(host: str, port: int, user: str, password: str, from_email: str, to_email: str, subject: str, body: str, attachment_path: Optional[str] = None) -> None:
+
+def build_message(from_email: str, to_email: str, subject: str, body: str, attachment_path: Optional[str] = None, attachment_name: Optional[str] = None) -> MIMEMultipart:
     message = MIMEMultipart()
     message['From'] = from_email
     message['To'] = to_email
@@ -15,15 +28,173 @@ def send_email_smtp(host: str, port: int, user: str, password: str, from_email:
     message.attach(MIMEText(body, 'plain'))
 
     if attachment_path:
-        part = MIMEBase('application', 'octet-stream')
+        filename = attachment_name or os.path.basename(attachment_path)
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        part = MIMEBase(*content_type.split('/', 1))
         with open(attachment_path, 'rb') as f:
             part.set_payload(f.read())
         encoders.encode_base64(part)
-        part.add_header('Content-Disposition', f'attachment; filename="{attachment_path.split("/")[-1]}"')
+        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
         message.attach(part)
+    return message
+
+
+class _DataWriter:
+    """File-like sink that dot-stuffs a CRLF message body onto an SMTP socket"""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._buffer = bytearray()
+        # The start of the DATA section counts as the start of a line
+        self._tail = b'\r\n'
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        stuffed = (self._tail + data).replace(b'\r\n.', b'\r\n..')[len(self._tail):]
+        self._tail = (self._tail + data)[-2:]
+        self._buffer += stuffed
+        if len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self.sock.sendall(self._buffer)
+            self._buffer.clear()
+
+    def finish(self) -> None:
+        if self._tail != b'\r\n':
+            self._buffer += b'\r\n'
+        self._buffer += b'.\r\n'
+        self.sock.sendall(self._buffer)
+        self._buffer.clear()
+
+
+def write_message(fp: BinaryIO, from_email: str, to_email: str, subject: str, body: str, attachment_path: Optional[str] = None, attachment_name: Optional[str] = None) -> None:
+    """Serialize the same message as ``build_message`` to a binary stream with CRLF line endings.
+
+    The attachment is read and base64-encoded chunk by chunk, so memory use
+    does not grow with its size.
+    """
+    policy = compat32.clone(linesep='\r\n')
+    boundary = f"==============={uuid.uuid4().hex}=="
+    headers = Message()
+    headers['Content-Type'] = 'multipart/mixed'
+    headers.set_param('boundary', boundary)
+    headers['MIME-Version'] = '1.0'
+    headers['From'] = from_email
+    headers['To'] = to_email
+    headers['Subject'] = subject
+    for name, value in headers.items():
+        fp.write(policy.fold_binary(name, value))
+    fp.write(b'\r\n')
+
+    fp.write(f"--{boundary}\r\n".encode('ascii'))
+    BytesGenerator(fp, mangle_from_=False, policy=policy).flatten(MIMEText(body, 'plain'))
+    fp.write(b'\r\n')
+
+    if attachment_path:
+        filename = attachment_name or os.path.basename(attachment_path)
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        part = MIMEBase(*content_type.split('/', 1))
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+        fp.write(f"--{boundary}\r\n".encode('ascii'))
+        BytesGenerator(fp, mangle_from_=False, policy=policy).flatten(part)
+        fp.write(b'\r\n')
+        with open(attachment_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(ATTACHMENT_CHUNK_SIZE), b''):
+                fp.write(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
+
+    fp.write(f"--{boundary}--\r\n".encode('ascii'))
+
 
-    with smtplib.SMTP(host, port) as server:
-        server.starttls()
-        if user:
-            server.login(user, password)
-        server.sendmail(from_email, [to_email], message.as_string())
+def stream_message(server: smtplib.SMTP, from_email: str, to_emails: List[str], write: Callable[[BinaryIO], None]) -> None:
+    """Run an SMTP transaction whose DATA is produced by ``write(fp)``.
+
+    The message goes to the socket while it is serialized instead of being
+    built as one string first, as ``server.sendmail`` requires.
+    """
+    code, resp = server.mail(from_email)
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, resp, from_email)
+    refused = {}
+    for rcpt in to_emails:
+        code, resp = server.rcpt(rcpt)
+        if code not in (250, 251):
+            refused[rcpt] = (code, resp)
+    if len(refused) == len(to_emails):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, resp = server.docmd('data')
+    if code != 354:
+        raise smtplib.SMTPDataError(code, resp)
+    writer = _DataWriter(server.sock)
+    write(writer)
+    writer.finish()
+    code, resp = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+
+
+class SMTPSender:
+    """One authenticated SMTP connection reused for several messages.
+
+    Use as a context manager; the connection is opened lazily on first send.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, use_tls: bool = True) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self._server: Optional[smtplib.SMTP] = None
+
+    def __enter__(self) -> 'SMTPSender':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._server is None:
+            server = smtplib.SMTP(self.host, self.port)
+            try:
+                if self.use_tls:
+                    server.starttls()
+                if self.user:
+                    server.login(self.user, self.password)
+            except Exception:
+                server.close()
+                raise
+            self._server = server
+        return self._server
+
+    def send(self, from_email: str, to_email: str, subject: str, body: str, attachment_path: Optional[str] = None, attachment_name: Optional[str] = None) -> None:
+        def write(fp: BinaryIO) -> None:
+            write_message(fp, from_email, to_email, subject, body, attachment_path, attachment_name)
+
+        try:
+            try:
+                stream_message(self._connect(), from_email, [to_email], write)
+            except smtplib.SMTPServerDisconnected:
+                # Relay dropped an idle connection; reconnect once
+                self._server = None
+                stream_message(self._connect(), from_email, [to_email], write)
+        except Exception:
+            # The session may be stuck mid-message; the next send starts a fresh one
+            if self._server is not None:
+                self._server.close()
+                self._server = None
+            raise
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                self._server.close()
+            self._server = None
+
+
+def send_email_smtp(host: str, port: int, user: str, password: str, from_email: str, to_email: str, subject: str, body: str, attachment_path: Optional[str] = None) -> None:
+    with SMTPSender(host, port, user, password) as sender:
+        sender.send(from_email, to_email, subject, body, attachment_path)
@@ -0,0 +1,98 @@
+import os
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # only the ASGI entry point needs it
+    httpx = None
+
+# Connect timeout is kept short; read timeouts are chosen per upstream call
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05') or 3.05)
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10') or 10)
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10') or 10)
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2') or 2)
+# Async mode: one pool per worker holds every in-flight upstream request
+ASYNC_MAX_CONNECTIONS = int(os.getenv('HTTP_ASYNC_MAX_CONNECTIONS', '200') or 200)
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def timeout(read: float) -> Tuple[float, float]:
+    """Build a (connect, read) timeout tuple"""
+    return (CONNECT_TIMEOUT, read)
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        # A read timeout already waited the full per-call budget; retrying it would multiply that
+        read=0,
+        status=MAX_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        # POSTs (SMS sends, paid TTS) are only retried when the connection failed
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the keep-alive session shared by all outbound clients in this process.
+
+    A new session is built after fork so gunicorn workers never share sockets.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+_async_clients: Dict[int, 'httpx.AsyncClient'] = {}
+
+
+def get_async_client() -> 'httpx.AsyncClient':
+    """Return the keep-alive async client for the running event loop.
+
+    Only connection failures are retried; unlike the sync session, 5xx answers
+    are returned as they are.
+    """
+    if httpx is None:
+        raise RuntimeError("httpx is not installed")
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(id(loop))
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES),
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=POOL_MAXSIZE * POOL_CONNECTIONS),
+            timeout=httpx.Timeout(30.0, connect=CONNECT_TIMEOUT),
+        )
+        _async_clients[id(loop)] = client
+    return client
+
+
+def async_timeout(read: float) -> 'httpx.Timeout':
+    """Async counterpart of ``timeout()``"""
+    return httpx.Timeout(read, connect=CONNECT_TIMEOUT)
+
+
+async def close_async_client() -> None:
+    client = _async_clients.pop(id(asyncio.get_running_loop()), None)
+    if client is not None:
+        await client.aclose()
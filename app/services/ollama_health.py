@@ -0,0 +1,151 @@
+import os
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How long a fetched model list is reused before /api/tags is asked again
+MODELS_TTL = float(os.getenv('OLLAMA_MODELS_TTL', '300') or 300)
+# Seconds between background probes of /api/tags
+PROBE_INTERVAL = float(os.getenv('OLLAMA_PROBE_SECONDS', '15') or 15)
+# Consecutive failed calls before Ollama is treated as down
+FAILURE_THRESHOLD = int(os.getenv('OLLAMA_FAILURE_THRESHOLD', '3') or 3)
+# A monitor nobody has asked about for this long stops probing (e.g. after the URL changed)
+IDLE_STOP = 600.0
+
+Models = List[Dict[str, Any]]
+
+
+class OllamaHealth:
+    """Model catalog and circuit breaker for one Ollama server.
+
+    Calls report their outcome here. After ``FAILURE_THRESHOLD`` failures in a
+    row the breaker opens and callers skip Ollama (and its timeouts) entirely;
+    only the background probe keeps trying, and its first success closes the
+    breaker again. State is per worker.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self._lock = threading.Lock()
+        self._models: Optional[Models] = None
+        self._models_fetched = 0.0
+        self._failures = 0
+        self._open = False
+        self._opened_at: Optional[float] = None
+        self._last_success: Optional[float] = None
+        self._last_failure: Optional[float] = None
+        self._last_error = ''
+        self._last_probe: Optional[float] = None
+        self._latency: Optional[float] = None
+        self._last_used = time.time()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def available(self) -> bool:
+        """False while the breaker is open"""
+        with self._lock:
+            return not self._open
+
+    def catalog(self, max_age: float = MODELS_TTL) -> Optional[Models]:
+        """The cached model list if it is fresh enough, else None"""
+        with self._lock:
+            if self._models is None or time.time() - self._models_fetched > max_age:
+                return None
+            return list(self._models)
+
+    def last_models(self) -> Models:
+        """The last model list fetched, however old"""
+        with self._lock:
+            return list(self._models or [])
+
+    def record_success(self, models: Optional[Models] = None, latency: Optional[float] = None) -> None:
+        with self._lock:
+            if self._open:
+                logger.info(f"Ollama at {self.url} is reachable again")
+            self._failures = 0
+            self._open = False
+            self._opened_at = None
+            self._last_success = time.time()
+            if models is not None:
+                self._models = list(models)
+                self._models_fetched = self._last_success
+            if latency is not None:
+                self._latency = latency
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self._failures += 1
+            self._last_failure = time.time()
+            self._last_error = error
+            if not self._open and self._failures >= FAILURE_THRESHOLD:
+                self._open = True
+                self._opened_at = self._last_failure
+                logger.warning(f"Ollama at {self.url} marked down after {self._failures} failures: {error}")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'url': self.url,
+                'state': 'open' if self._open else 'closed',
+                'available': not self._open,
+                'consecutive_failures': self._failures,
+                'opened_at': self._opened_at,
+                'last_success': self._last_success,
+                'last_failure': self._last_failure,
+                'last_error': self._last_error,
+                'last_probe': self._last_probe,
+                'latency_ms': round(self._latency * 1000, 1) if self._latency is not None else None,
+                'models': len(self._models or []),
+                'models_age': round(time.time() - self._models_fetched, 1) if self._models is not None else None,
+            }
+
+    def monitor(self, probe: Callable[[], Models]) -> None:
+        """Make sure the background probe is running in this worker"""
+        with self._lock:
+            self._last_used = time.time()
+            # Threads do not survive fork, so each gunicorn worker starts its own
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, args=(probe,), name='ollama-health', daemon=True)
+            self._thread.start()
+
+    def probe_once(self, probe: Callable[[], Models]) -> bool:
+        start = time.perf_counter()
+        try:
+            models = probe()
+        except Exception as e:
+            self._last_probe = time.time()
+            self.record_failure(str(e))
+            return False
+        self._last_probe = time.time()
+        self.record_success(models, time.perf_counter() - start)
+        return True
+
+    def _loop(self, probe: Callable[[], Models]) -> None:
+        while True:
+            time.sleep(PROBE_INTERVAL)
+            with self._lock:
+                if time.time() - self._last_used > IDLE_STOP:
+                    self._thread = None
+                    return
+            self.probe_once(probe)
+
+
+_monitors: Dict[Tuple[str, str], OllamaHealth] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_ollama_health(url: str, api_key: Optional[str] = None) -> OllamaHealth:
+    """Return the process-wide health state for an Ollama server"""
+    key = (url, api_key or '')
+    with _monitors_lock:
+        health = _monitors.get(key)
+        if health is None:
+            health = OllamaHealth(url)
+            _monitors[key] = health
+        return health
+
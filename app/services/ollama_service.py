@@ -1,52 +1,16 @@
-import requests
+import json
+import time
 import logging
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Iterator, List, Dict, Optional
+
+from .http_client import async_timeout, get_async_client, get_session, timeout
+from .ollama_health import get_ollama_health
+from .single_flight import get_single_flight
+from ..utils.metrics import OLLAMA_SECONDS
 
 logger = logging.getLogger(__name__)
 
-class OllamaService:
-    def __init__(self, base_url: str, api_key: Optional[str] = None):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.session = requests.Session()
-        if api_key:
-            self.session.headers.update({'Authorization': f'Bearer {api_key}'})
-    
-    def list_models(self) -> List[Dict[str, str]]:
-        """List available Ollama models"""
-        try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            models = []
-            if 'models' in data:
-                for model in data['models']:
-                    models.append({
-                        'name': model.get('name', ''),
-                        'size': model.get('size', 0),
-                        'modified_at': model.get('modified_at', ''),
-                        'digest': model.get('digest', '')
-                    })
-            
-            return models
-        except Exception as e:
-            logger.error(f"Failed to list Ollama models: {str(e)}")
-            return []
-    
-    def generate_prompt(self, model: str, context: str = "") -> str:
-        """Generate a funny and informative photobooth prompt using Ollama"""
-        
-        # If no model is specified, try to get the first available model
-        if not model:
-            models = self.list_models()
-            if models:
-                model = models[0]['name']
-            else:
-                logger.error("No models available on Ollama server")
-                return self._get_fallback_prompt()
-        
-        system_prompt = """You are a fun and engaging AI assistant for a photobooth. Your job is to generate short, funny, and informative prompts that will be spoken to people before they take a photo.
+SYSTEM_PROMPT = """You are a fun and engaging AI assistant for a photobooth. Your job is to generate short, funny, and informative prompts that will be spoken to people before they take a photo.
 
 The prompt should:
 - Be 1-2 sentences maximum (under 100 characters)
@@ -64,71 +28,321 @@ Examples of good prompts:
 
 Generate a new, creative prompt that's different from the examples above."""
 
-        user_prompt = f"Generate a photobooth prompt. {context}".strip()
-        
+# Served when Ollama is unavailable; also pre-synthesized by the TTS warm-up
+FALLBACK_PROMPTS = [
+    "Strike a pose that says 'I woke up like this'! 📸",
+    "Show me your best superhero landing pose! 🦸‍♂️",
+    "Channel your inner rockstar and give us attitude! 🎸",
+    "Pretend you just won the lottery! 🎉",
+    "Look like you're about to drop the hottest album of 2024! 🎵",
+    "Give us your best 'I just had the best idea ever' face! 💡",
+    "Pose like you're about to save the world! 🌍",
+    "Show us your 'I'm too cool for school' look! 😎"
+]
+
+
+class OllamaService:
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        # Shared keep-alive session; auth is sent per request since the session is shared
+        self.session = get_session()
+        self.headers = {'Authorization': f'Bearer {api_key}'} if api_key else {}
+        # Shared per server: a background probe keeps the model list and up/down state current
+        self.health = get_ollama_health(self.base_url, api_key)
+        self.health.monitor(lambda: self.fetch_models(read_timeout=5))
+    
+    def list_models(self) -> List[Dict[str, str]]:
+        """List available Ollama models"""
+        models = self.health.catalog()
+        if models is not None:
+            return models
+        if not self.health.available():
+            return self.health.last_models()
+        # Kiosks resolving the model at the same moment share one request per server
+        models = get_single_flight('ollama-models').do(
+            self._flight_key(), lambda: json.dumps(self._fetch_models()).encode('utf-8'))
+        return json.loads(models)
+
+    def fetch_models(self, read_timeout: float = 10) -> List[Dict[str, str]]:
+        """Ask the server for its models, bypassing the cache; raises on failure"""
+        response = self.session.get(f"{self.base_url}/api/tags", headers=self.headers, timeout=timeout(read_timeout))
+        response.raise_for_status()
+        return self.parse_models(response.json())
+
+    def _fetch_models(self) -> List[Dict[str, str]]:
+        start = time.perf_counter()
+        try:
+            models = self.fetch_models()
+        except Exception as e:
+            logger.error(f"Failed to list Ollama models: {str(e)}")
+            self.health.record_failure(str(e))
+            return []
+        self.health.record_success(models, time.perf_counter() - start)
+        return models
+
+    def _flight_key(self) -> str:
+        # Hashed before it touches the disk, so the key never leaks
+        return f"{self.base_url}|{self.api_key}"
+    
+    def resolve_model(self, model: str) -> Optional[str]:
+        """Return the configured model, or the first one available on the server"""
+        if model:
+            return model
+        models = self.list_models()
+        if models:
+            return models[0]['name']
+        logger.error("No models available on Ollama server")
+        return None
+
+    def generate_prompt(self, model: str, context: str = "") -> str:
+        """Generate a funny and informative photobooth prompt using Ollama"""
+        prompt = self.try_generate_prompt(model, context)
+        return prompt if prompt is not None else self._get_fallback_prompt()
+
+    def try_generate_prompt(self, model: str, context: str = "") -> Optional[str]:
+        """Generate a prompt, returning None instead of a fallback on failure"""
+        # Ollama is known to be down: fall back now rather than after a timeout
+        if not self.health.available():
+            return None
+        model = self.resolve_model(model)
+        if not model:
+            return None
+
+        start = time.perf_counter()
+        outcome = 'error'
         try:
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "stream": False,
-                "options": {
-                    "temperature": 0.8,
-                    "top_p": 0.9,
-                    "max_tokens": 150
-                }
-            }
-            
             response = self.session.post(
                 f"{self.base_url}/api/chat",
-                json=payload,
-                timeout=30
+                json=self._chat_payload(model, context, stream=False),
+                headers=self.headers,
+                timeout=timeout(30)
             )
             response.raise_for_status()
             
             data = response.json()
             if 'message' in data and 'content' in data['message']:
-                prompt = data['message']['content'].strip()
-                # Clean up the prompt - remove quotes, extra formatting
-                prompt = prompt.replace('"', '').replace('"', '').replace('"', '')
-                prompt = prompt.replace("'", '').replace("'", '')
-                
-                # Ensure it's not too long
-                if len(prompt) > 100:
-                    prompt = prompt[:97] + "..."
-                
+                prompt = self.clean_prompt(data['message']['content'])
                 logger.info(f"Generated Ollama prompt: {prompt}")
+                outcome = 'ok'
+                self.health.record_success()
                 return prompt
             else:
                 logger.error("Unexpected Ollama response format")
-                return self._get_fallback_prompt()
+                return None
                 
         except Exception as e:
             logger.error(f"Failed to generate Ollama prompt: {str(e)}")
-            return self._get_fallback_prompt()
+            self.health.record_failure(str(e))
+            return None
+        finally:
+            OLLAMA_SECONDS.observe(time.perf_counter() - start, mode='complete', outcome=outcome)
     
+    def stream_prompt(self, model: str, context: str = "") -> Iterator[str]:
+        """Yield prompt text chunks as Ollama generates them.
+
+        Raises on connection or HTTP errors so callers can fall back.
+        """
+        if not self.health.available():
+            raise RuntimeError("Ollama is marked down")
+        model = self.resolve_model(model)
+        if not model:
+            raise RuntimeError("No models available on Ollama server")
+
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/chat",
+                json=self._chat_payload(model, context, stream=True),
+                headers=self.headers,
+                timeout=timeout(30),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    chunk = data.get('message', {}).get('content', '')
+                    if chunk:
+                        yield chunk
+                    if data.get('done'):
+                        break
+            outcome = 'ok'
+            self.health.record_success()
+        except GeneratorExit:
+            # The client went away mid-stream
+            outcome = 'aborted'
+            raise
+        except Exception as e:
+            self.health.record_failure(str(e))
+            raise
+        finally:
+            OLLAMA_SECONDS.observe(time.perf_counter() - start, mode='stream', outcome=outcome)
+
+    @staticmethod
+    def parse_models(data: Dict) -> List[Dict[str, str]]:
+        models = []
+        if 'models' in data:
+            for model in data['models']:
+                models.append({
+                    'name': model.get('name', ''),
+                    'size': model.get('size', 0),
+                    'modified_at': model.get('modified_at', ''),
+                    'digest': model.get('digest', '')
+                })
+        return models
+
+    @staticmethod
+    def _chat_payload(model: str, context: str, stream: bool) -> Dict:
+        user_prompt = f"Generate a photobooth prompt. {context}".strip()
+        return {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            "stream": stream,
+            "options": {
+                "temperature": 0.8,
+                "top_p": 0.9,
+                "max_tokens": 150
+            }
+        }
+
+    @staticmethod
+    def clean_prompt(text: str) -> str:
+        """Strip quotes and formatting and cap the length for TTS"""
+        prompt = text.strip()
+        # Clean up the prompt - remove quotes, extra formatting
+        prompt = prompt.replace('"', '').replace('"', '').replace('"', '')
+        prompt = prompt.replace("'", '').replace("'", '')
+        
+        # Ensure it's not too long
+        if len(prompt) > 100:
+            prompt = prompt[:97] + "..."
+        return prompt
+
     def _get_fallback_prompt(self) -> str:
         """Get a fallback prompt when AI generation fails"""
-        fallback_prompts = [
-            "Strike a pose that says 'I woke up like this'! 📸",
-            "Show me your best superhero landing pose! 🦸‍♂️",
-            "Channel your inner rockstar and give us attitude! 🎸",
-            "Pretend you just won the lottery! 🎉",
-            "Look like you're about to drop the hottest album of 2024! 🎵",
-            "Give us your best 'I just had the best idea ever' face! 💡",
-            "Pose like you're about to save the world! 🌍",
-            "Show us your 'I'm too cool for school' look! 😎"
-        ]
         import random
-        return random.choice(fallback_prompts)
+        return random.choice(FALLBACK_PROMPTS)
     
     def test_connection(self) -> bool:
         """Test if Ollama service is accessible"""
+        # A manual test counts as a probe, so it can also close the breaker
+        if self.health.probe_once(lambda: self.fetch_models(read_timeout=5)):
+            return True
+        logger.error(f"Ollama connection test failed: {self.health.status()['last_error']}")
+        return False
+
+
+class AsyncOllamaService(OllamaService):
+    """Ollama client for the ASGI app: the same calls, awaited on the shared async client"""
+
+    async def list_models_async(self) -> List[Dict[str, str]]:
+        models = self.health.catalog()
+        if models is not None:
+            return models
+        if not self.health.available():
+            return self.health.last_models()
+
+        async def fetch() -> bytes:
+            return json.dumps(await self._fetch_models_async()).encode('utf-8')
+        models = await get_single_flight('ollama-models').do_async(self._flight_key(), fetch)
+        return json.loads(models)
+
+    async def _fetch_models_async(self) -> List[Dict[str, str]]:
+        start = time.perf_counter()
         try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
+            response = await get_async_client().get(f"{self.base_url}/api/tags", headers=self.headers, timeout=async_timeout(10))
+            response.raise_for_status()
+            models = self.parse_models(response.json())
+        except Exception as e:
+            logger.error(f"Failed to list Ollama models: {str(e)}")
+            self.health.record_failure(str(e))
+            return []
+        self.health.record_success(models, time.perf_counter() - start)
+        return models
+
+    async def resolve_model_async(self, model: str) -> Optional[str]:
+        if model:
+            return model
+        models = await self.list_models_async()
+        if models:
+            return models[0]['name']
+        logger.error("No models available on Ollama server")
+        return None
+
+    async def generate_prompt_async(self, model: str, context: str = "") -> str:
+        if not self.health.available():
+            return self._get_fallback_prompt()
+        model = await self.resolve_model_async(model)
+        if not model:
+            return self._get_fallback_prompt()
+
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = await get_async_client().post(
+                f"{self.base_url}/api/chat",
+                json=self._chat_payload(model, context, stream=False),
+                headers=self.headers,
+                timeout=async_timeout(30)
+            )
+            response.raise_for_status()
+            data = response.json()
+            if 'message' in data and 'content' in data['message']:
+                prompt = self.clean_prompt(data['message']['content'])
+                logger.info(f"Generated Ollama prompt: {prompt}")
+                outcome = 'ok'
+                self.health.record_success()
+                return prompt
+            logger.error("Unexpected Ollama response format")
+        except Exception as e:
+            logger.error(f"Failed to generate Ollama prompt: {str(e)}")
+            self.health.record_failure(str(e))
+        finally:
+            OLLAMA_SECONDS.observe(time.perf_counter() - start, mode='complete', outcome=outcome)
+        return self._get_fallback_prompt()
+
+    async def stream_prompt_async(self, model: str, context: str = "") -> AsyncIterator[str]:
+        """Async counterpart of ``stream_prompt``; raises on connection or HTTP errors"""
+        if not self.health.available():
+            raise RuntimeError("Ollama is marked down")
+        model = await self.resolve_model_async(model)
+        if not model:
+            raise RuntimeError("No models available on Ollama server")
+
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            async with get_async_client().stream(
+                'POST',
+                f"{self.base_url}/api/chat",
+                json=self._chat_payload(model, context, stream=True),
+                headers=self.headers,
+                timeout=async_timeout(30)
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    chunk = data.get('message', {}).get('content', '')
+                    if chunk:
+                        yield chunk
+                    if data.get('done'):
+                        break
+            outcome = 'ok'
+            self.health.record_success()
+        except GeneratorExit:
+            outcome = 'aborted'
+            raise
         except Exception as e:
-            logger.error(f"Ollama connection test failed: {str(e)}")
-            return False
+            self.health.record_failure(str(e))
+            raise
+        finally:
+            OLLAMA_SECONDS.observe(time.perf_counter() - start, mode='stream', outcome=outcome)
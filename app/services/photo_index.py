@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from PIL import Image
+
+from ..utils.image_encoder import IMAGE_EXTENSIONS, MEDIA_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = '.photo_index.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    filename   TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    size       INTEGER NOT NULL,
+    width      INTEGER,
+    height     INTEGER,
+    frame      TEXT
+)
+"""
+
+
+class PhotoIndex:
+    """SQLite catalog of captured photos, shared by all gunicorn workers.
+
+    Filenames embed the capture timestamp, so they double as the sort key and
+    the pagination cursor.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, filename: str, created_at: float, size: int, width: Optional[int] = None, height: Optional[int] = None, frame: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO photos (filename, created_at, size, width, height, frame) VALUES (?, ?, ?, ?, ?, ?)',
+                (filename, created_at, size, width, height, frame or None),
+            )
+
+    def add_file(self, folder: str, filename: str, frame: Optional[str] = None, dimensions: Optional[Tuple[int, int]] = None) -> None:
+        """Index a photo on disk, reading its dimensions if not given"""
+        stat = os.stat(os.path.join(folder, filename))
+        if dimensions is None:
+            try:
+                with Image.open(os.path.join(folder, filename)) as img:
+                    dimensions = img.size
+            except Exception:
+                dimensions = (None, None)
+        self.add(filename, stat.st_mtime, stat.st_size, dimensions[0], dimensions[1], frame)
+
+    def page(self, after: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT * FROM photos WHERE filename > ? ORDER BY filename LIMIT ?',
+                (after or '', limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM photos WHERE filename = ?', (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM photos').fetchone()[0]
+
+    def sync(self, folder: str) -> Tuple[int, int]:
+        """Reconcile the index with the photos on disk; returns (added, removed).
+
+        Only new, changed (by mtime) and deleted files are written, in one
+        transaction. Dimensions of new files are left empty for
+        ``fill_dimensions``, so a large folder is indexed without opening every
+        image.
+        """
+        if not os.path.exists(folder):
+            return 0, 0
+        on_disk: Dict[str, Tuple[float, int]] = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(MEDIA_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    on_disk[entry.name] = (stat.st_mtime, stat.st_size)
+        with self._connect() as conn:
+            indexed = {row[0]: row[1] for row in conn.execute('SELECT filename, created_at FROM photos')}
+            removed = [f for f in indexed if f not in on_disk]
+            added = [(f, mtime, size) for f, (mtime, size) in on_disk.items() if indexed.get(f) != mtime]
+            conn.executemany('DELETE FROM photos WHERE filename = ?', [(f,) for f in removed])
+            conn.executemany(
+                'INSERT OR REPLACE INTO photos (filename, created_at, size, width, height, frame) VALUES (?, ?, ?, NULL, NULL, NULL)',
+                added,
+            )
+        return len(added), len(removed)
+
+    def fill_dimensions(self, folder: str, batch: int = 200) -> int:
+        """Read the dimensions of indexed images that have none; returns photos updated"""
+        updated = 0
+        after = ''
+        while True:
+            with self._connect() as conn:
+                names = [row[0] for row in conn.execute(
+                    'SELECT filename FROM photos WHERE width IS NULL AND filename > ? ORDER BY filename LIMIT ?',
+                    (after, batch),
+                )]
+            if not names:
+                return updated
+            after = names[-1]
+            sizes = []
+            for filename in names:
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    with Image.open(os.path.join(folder, filename)) as img:
+                        sizes.append((img.size[0], img.size[1], filename))
+                except Exception:
+                    continue
+            with self._connect() as conn:
+                conn.executemany('UPDATE photos SET width = ?, height = ? WHERE filename = ? AND width IS NULL', sizes)
+            updated += len(sizes)
+
+
+_indexes: Dict[str, PhotoIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_photo_index(photos_folder: str) -> PhotoIndex:
+    """Return the process-wide index for a photos folder.
+
+    The first call in each process reconciles the index with the folder, so
+    photos taken before the index existed are picked up once. Only that call
+    waits for the sync; dimensions are filled in on a background thread.
+    """
+    with _indexes_lock:
+        index = _indexes.get(photos_folder)
+        if index is not None:
+            return index
+        index = PhotoIndex(os.path.join(photos_folder, INDEX_FILENAME))
+        _indexes[photos_folder] = index
+
+    added, removed = index.sync(photos_folder)
+    if added or removed:
+        logger.info(f"Photo index synced: {added} added, {removed} removed")
+    if added:
+        threading.Thread(target=index.fill_dimensions, args=(photos_folder,), name='photo-index-dimensions', daemon=True).start()
+    return index
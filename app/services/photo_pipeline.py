@@ -0,0 +1,226 @@
+import io
+import os
+import re
+import time
+import secrets
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional
+from PIL import Image
+
+from ..utils.image_encoder import encode_image, file_extension, MEDIA_EXTENSIONS
+from ..utils.metrics import PHOTO_JOBS, PHOTO_STAGE_SECONDS
+from .burst import burst_extension, render_burst
+from .compositing import composite
+from .derivatives import generate_all
+from .photo_index import get_photo_index
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PATTERN = re.compile(r'^photo_\d{8}_\d{6}_[0-9a-f]{6}$')
+# Per-job markers shared by all workers: <job_id>.pending while queued, <job_id>.error after a failure
+JOBS_DIR = '.jobs'
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def composite_and_save(image: Image.Image, frame_name: str, upload_folder: str, save_path: str, photo_settings: Mapping[str, Any]) -> Image.Image:
+    """Composite a decoded camera image with a frame and write it atomically"""
+    # Composite with selected frame server-side to ensure consistency
+    with PHOTO_STAGE_SECONDS.time(stage='composite'):
+        image = composite(image, frame_name, upload_folder)
+
+    # Encoding into memory keeps CPU time and disk time apart in the metrics
+    buf = io.BytesIO()
+    with PHOTO_STAGE_SECONDS.time(stage='encode'):
+        encode_image(image, buf, photo_settings)
+
+    # Write to a temp file first so readers never see a partial photo
+    tmp_path = f"{save_path}.tmp"
+    with PHOTO_STAGE_SECONDS.time(stage='write'):
+        with open(tmp_path, 'wb') as f:
+            f.write(buf.getbuffer())
+        os.replace(tmp_path, save_path)
+    return image
+
+
+class PhotoPipeline:
+    """Bounded thread pool that decodes, composites and encodes captured photos.
+
+    Full job state lives in this process. Job ids are the photo's file stem, so
+    any worker can report a finished job by looking for the file on disk; queued
+    and failed jobs leave a marker in ``JOBS_DIR`` for the other workers.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, job_ttl: int = 600) -> None:
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='photo')
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    @staticmethod
+    def new_filename(extension: str = '.png') -> str:
+        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"photo_{ts}_{secrets.token_hex(3)}{extension}"
+
+    def _new_job(self, extension: str, photos_folder: str) -> Dict[str, Any]:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError("Photo processing queue is full")
+            self._pending += 1
+            self._expire_jobs(photos_folder)
+
+            filename = self.new_filename(extension)
+            job_id = os.path.splitext(filename)[0]
+            job = {
+                'job_id': job_id,
+                'filename': filename,
+                'status': 'queued',
+                'error': None,
+                'created_at': time.time(),
+            }
+            self._jobs[job_id] = job
+        self._write_marker(photos_folder, job_id, 'pending')
+        return job
+
+    def submit(self, image_bytes: bytes, frame_name: str, upload_folder: str, photos_folder: str, photo_settings: Mapping[str, Any]) -> Dict[str, Any]:
+        """Queue a capture for processing and return its job record"""
+        job = self._new_job(file_extension(photo_settings), photos_folder)
+        save_path = os.path.join(photos_folder, job['filename'])
+        self._executor.submit(self._run, job, image_bytes, frame_name, upload_folder, save_path, photo_settings)
+        return dict(job)
+
+    def submit_burst(self, frames: List[bytes], frame_name: str, mode: str, upload_folder: str, photos_folder: str, photo_settings: Mapping[str, Any]) -> Dict[str, Any]:
+        """Queue several captures to become one strip or animation"""
+        job = self._new_job(burst_extension(mode, photo_settings), photos_folder)
+        save_path = os.path.join(photos_folder, job['filename'])
+        self._executor.submit(self._run_burst, job, frames, frame_name, mode, upload_folder, save_path, photo_settings)
+        return dict(job)
+
+    def status(self, job_id: str, photos_folder: str) -> Optional[Dict[str, Any]]:
+        """Return the job record, or None if the job is unknown to every worker"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+
+        # Submitted through another worker: the finished file is the source of truth
+        for ext in MEDIA_EXTENSIONS:
+            filename = f"{job_id}{ext}"
+            if os.path.exists(os.path.join(photos_folder, filename)):
+                return {'job_id': job_id, 'filename': filename, 'status': 'done', 'error': None}
+        marker = os.path.join(photos_folder, JOBS_DIR, job_id)
+        try:
+            with open(f"{marker}.error", 'r', encoding='utf-8') as f:
+                return {'job_id': job_id, 'filename': None, 'status': 'error', 'error': f.read()}
+        except OSError:
+            pass
+        if os.path.exists(f"{marker}.pending"):
+            return {'job_id': job_id, 'filename': None, 'status': 'queued', 'error': None}
+        return None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Block until a job submitted by this worker is done or failed, or ``timeout`` passes"""
+        with self._finished:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._finished.wait_for(lambda: job['status'] in ('done', 'error'), timeout)
+            return dict(job)
+
+    def _run(self, job: Dict[str, Any], image_bytes: bytes, frame_name: str, upload_folder: str, save_path: str, photo_settings: Mapping[str, Any]) -> None:
+        def render() -> Image.Image:
+            with PHOTO_STAGE_SECONDS.time(stage='decode'):
+                image = Image.open(io.BytesIO(image_bytes))
+                image.load()
+            return composite_and_save(image, frame_name, upload_folder, save_path, photo_settings)
+
+        self._process(job, 'single', render, frame_name, save_path)
+
+    def _run_burst(self, job: Dict[str, Any], frames: List[bytes], frame_name: str, mode: str, upload_folder: str, save_path: str, photo_settings: Mapping[str, Any]) -> None:
+        def render() -> Image.Image:
+            # Compositing fans out to the process pool; this thread only waits and encodes
+            with PHOTO_STAGE_SECONDS.time(stage='burst'):
+                return render_burst(frames, frame_name, upload_folder, mode, save_path, photo_settings)
+
+        self._process(job, 'burst', render, frame_name, save_path)
+
+    def _process(self, job: Dict[str, Any], kind: str, render: Callable[[], Image.Image], frame_name: str, save_path: str) -> None:
+        PHOTO_STAGE_SECONDS.observe(time.time() - job['created_at'], stage='queue')
+        job['status'] = 'processing'
+        photos_folder, filename = os.path.split(save_path)
+        try:
+            image = render()
+            with PHOTO_STAGE_SECONDS.time(stage='index'):
+                get_photo_index(photos_folder).add_file(photos_folder, filename, frame=frame_name, dimensions=image.size)
+            with self._finished:
+                job['status'] = 'done'
+                self._finished.notify_all()
+            PHOTO_JOBS.inc(kind=kind, outcome='done')
+            # Gallery thumbnails are built from the in-memory result, after the job is reported done
+            with PHOTO_STAGE_SECONDS.time(stage='derivatives'):
+                generate_all(photos_folder, filename, image)
+        except Exception as e:
+            logger.error(f"Photo job {job['job_id']} failed: {str(e)}")
+            if job['status'] != 'done':
+                PHOTO_JOBS.inc(kind=kind, outcome='error')
+            job['status'] = 'error'
+            job['error'] = str(e)
+            self._write_marker(photos_folder, job['job_id'], 'error', str(e))
+        finally:
+            job['finished_at'] = time.time()
+            self._remove_marker(photos_folder, job['job_id'], 'pending')
+            with self._finished:
+                self._pending -= 1
+                self._finished.notify_all()
+
+    @staticmethod
+    def _write_marker(photos_folder: str, job_id: str, kind: str, content: str = '') -> None:
+        folder = os.path.join(photos_folder, JOBS_DIR)
+        path = os.path.join(folder, f"{job_id}.{kind}")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not write photo job marker {path}: {str(e)}")
+
+    @staticmethod
+    def _remove_marker(photos_folder: str, job_id: str, kind: str) -> None:
+        try:
+            os.remove(os.path.join(photos_folder, JOBS_DIR, f"{job_id}.{kind}"))
+        except OSError:
+            pass
+
+    def _expire_jobs(self, photos_folder: str) -> None:
+        now = time.time()
+        cutoff = now - self.job_ttl
+        for job_id in [k for k, j in self._jobs.items() if j.get('finished_at', now) < cutoff]:
+            del self._jobs[job_id]
+        # Markers left by failed jobs, or by a worker that died mid-job
+        folder = os.path.join(photos_folder, JOBS_DIR)
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+photo_pipeline = PhotoPipeline(
+    max_workers=int(os.getenv('PHOTO_WORKERS', '2') or 2),
+    max_pending=int(os.getenv('PHOTO_QUEUE_SIZE', '32') or 32),
+)
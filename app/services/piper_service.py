@@ -0,0 +1,170 @@
+import io
+import os
+import json
+import wave
+import shutil
+import threading
+import subprocess
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from piper import PiperVoice
+except ImportError:  # piper-tts not installed: the service reports itself unavailable
+    PiperVoice = None
+
+logger = logging.getLogger(__name__)
+
+# Voices kept loaded per worker; a medium-quality model is roughly 60 MB
+MAX_LOADED_VOICES = int(os.getenv('PIPER_MAX_VOICES', '2') or 2)
+MP3_BITRATE = '64k'
+TRANSCODE_TIMEOUT = 30
+
+
+def piper_available() -> bool:
+    return PiperVoice is not None
+
+
+def list_voices(models_dir: str) -> List[Dict[str, Any]]:
+    """Describe every installed voice (an ``.onnx`` model with its ``.onnx.json`` config)"""
+    if not os.path.isdir(models_dir):
+        return []
+    voices = []
+    for name in sorted(os.listdir(models_dir)):
+        if not name.endswith('.onnx'):
+            continue
+        config_path = os.path.join(models_dir, f"{name}.json")
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            continue
+        voice_id = name[:-len('.onnx')]
+        language = (config.get('language') or {}).get('code', '')
+        quality = (config.get('audio') or {}).get('quality', '')
+        dataset = config.get('dataset') or voice_id
+        details = ', '.join(part for part in (language, quality) if part)
+        voices.append({
+            'id': voice_id,
+            'name': f"{dataset.replace('_', ' ').title()} ({details})" if details else dataset,
+            'gender': 'neutral',
+        })
+    return voices
+
+
+def wav_to_mp3(wav: bytes) -> Optional[bytes]:
+    """Transcode with ffmpeg; returns None when ffmpeg is missing or fails"""
+    if shutil.which('ffmpeg') is None:
+        return None
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0', '-f', 'mp3', '-b:a', MP3_BITRATE, 'pipe:1'],
+            input=wav, capture_output=True, timeout=TRANSCODE_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Piper MP3 transcode failed: {str(e)}")
+        return None
+    if result.returncode != 0:
+        logger.warning(f"Piper MP3 transcode failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return None
+    return result.stdout
+
+
+class PiperEngine:
+    """Local Piper synthesis with voice models loaded once per worker.
+
+    Loaded voices are kept in a small LRU; synthesis on one voice is serialized
+    since ONNX Runtime already spreads a single run across cores.
+    """
+
+    def __init__(self, models_dir: str, max_voices: int = 2) -> None:
+        self.models_dir = models_dir
+        self.max_voices = max_voices
+        self._voices: 'OrderedDict[str, Any]' = OrderedDict()
+        self._voice_locks: Dict[str, threading.Lock] = {}
+        self._loading: Set[str] = set()
+        # Voices whose background load failed are only retried on an explicit request
+        self._failed: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def model_path(self, voice_id: str) -> Optional[str]:
+        if not voice_id or os.path.basename(voice_id) != voice_id:
+            return None
+        path = os.path.join(self.models_dir, f"{voice_id}.onnx")
+        return path if os.path.exists(path) and os.path.exists(f"{path}.json") else None
+
+    def _voice(self, voice_id: str) -> Any:
+        with self._lock:
+            voice = self._voices.get(voice_id)
+            if voice is not None:
+                self._voices.move_to_end(voice_id)
+                return voice
+            lock = self._voice_locks.setdefault(voice_id, threading.Lock())
+
+        # Loading takes a second or two; other voices stay usable meanwhile
+        with lock:
+            with self._lock:
+                voice = self._voices.get(voice_id)
+            if voice is not None:
+                return voice
+            if PiperVoice is None:
+                raise RuntimeError("piper-tts is not installed")
+            path = self.model_path(voice_id)
+            if path is None:
+                raise ValueError(f"Piper voice not installed: {voice_id}")
+            voice = PiperVoice.load(path, config_path=f"{path}.json")
+            logger.info(f"Loaded Piper voice {voice_id}")
+
+        with self._lock:
+            self._voices[voice_id] = voice
+            self._voices.move_to_end(voice_id)
+            while len(self._voices) > self.max_voices:
+                self._voices.popitem(last=False)
+        return voice
+
+    def synthesize(self, voice_id: str, text: str) -> bytes:
+        """Return ``text`` spoken by ``voice_id`` as WAV bytes"""
+        voice = self._voice(voice_id)
+        buf = io.BytesIO()
+        with self._voice_locks[voice_id]:
+            with wave.open(buf, 'wb') as wav_file:
+                if hasattr(voice, 'synthesize_wav'):
+                    voice.synthesize_wav(text, wav_file)
+                else:  # piper-tts < 1.3
+                    voice.synthesize(text, wav_file)
+        return buf.getvalue()
+
+    def preload(self, voice_id: str) -> None:
+        """Load a voice in the background unless it is loaded or loading already"""
+        with self._lock:
+            if PiperVoice is None or voice_id in self._voices or voice_id in self._loading or voice_id in self._failed:
+                return
+            self._loading.add(voice_id)
+
+        def load() -> None:
+            try:
+                self._voice(voice_id)
+            except Exception as e:
+                logger.warning(f"Could not preload Piper voice {voice_id}: {str(e)}")
+                with self._lock:
+                    self._failed.add(voice_id)
+            finally:
+                with self._lock:
+                    self._loading.discard(voice_id)
+
+        threading.Thread(target=load, name='piper-preload', daemon=True).start()
+
+
+_engines: Dict[str, PiperEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_piper_engine(models_dir: str) -> PiperEngine:
+    """Return the process-wide Piper engine for a models directory"""
+    with _engines_lock:
+        engine = _engines.get(models_dir)
+        if engine is None:
+            engine = PiperEngine(models_dir, max_voices=MAX_LOADED_VOICES)
+            _engines[models_dir] = engine
+        return engine
@@ -0,0 +1,115 @@
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Tuple
+
+from .ollama_service import OllamaService
+
+logger = logging.getLogger(__name__)
+
+# Prompts served recently are not accepted back into the pool
+RECENT_PROMPTS = 50
+# Pause before refilling again after Ollama failed to produce a prompt
+RETRY_DELAY = 30.0
+# Contexts the kiosk pages send; any other value shares the default pool
+POOL_CONTEXTS = frozenset({'', 'photobooth'})
+# Pools kept per worker, least recently used dropped first (e.g. after settings changes)
+MAX_POOLS = 8
+
+
+def _normalize(prompt: str) -> str:
+    return ' '.join(prompt.lower().split())
+
+
+class PromptPool:
+    """Ready-made Ollama prompts, refilled by a background thread.
+
+    Popping never blocks on Ollama: the caller gets a pooled prompt or None,
+    and a refill is started whenever the pool is below its target depth.
+    """
+
+    def __init__(self, url: str, api_key: str, model: str, context: str = '', target_depth: int = 5) -> None:
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.context = context
+        self.target_depth = target_depth
+        self._prompts: Deque[str] = deque()
+        self._recent: Deque[str] = deque(maxlen=RECENT_PROMPTS)
+        self._lock = threading.Lock()
+        self._refilling = False
+        self._retry_after = 0.0
+
+    def pop(self) -> Optional[str]:
+        with self._lock:
+            prompt = self._prompts.popleft() if self._prompts else None
+        self.refill()
+        return prompt
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._prompts)
+
+    def refill(self) -> None:
+        """Start a background refill unless one is running or the pool is full"""
+        with self._lock:
+            if self._refilling or len(self._prompts) >= self.target_depth or time.time() < self._retry_after:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name='ollama-prompt-pool', daemon=True).start()
+
+    def _accept(self, prompt: str) -> bool:
+        key = _normalize(prompt)
+        with self._lock:
+            if not key or key in self._recent:
+                return False
+            self._prompts.append(prompt)
+            self._recent.append(key)
+            return True
+
+    def _refill(self) -> None:
+        try:
+            service = OllamaService(self.url, self.api_key)
+            # Resolve the model once per refill rather than once per prompt
+            model = service.resolve_model(self.model)
+            if not model:
+                self._retry_after = time.time() + RETRY_DELAY
+                return
+            attempts = 0
+            while self.depth() < self.target_depth and attempts < self.target_depth * 3:
+                attempts += 1
+                prompt = service.try_generate_prompt(model, self.context)
+                if prompt is None:
+                    self._retry_after = time.time() + RETRY_DELAY
+                    return
+                if not self._accept(prompt):
+                    logger.debug(f"Discarded duplicate Ollama prompt: {prompt}")
+        except Exception as e:
+            logger.error(f"Ollama prompt pool refill failed: {str(e)}")
+            self._retry_after = time.time() + RETRY_DELAY
+        finally:
+            with self._lock:
+                self._refilling = False
+
+
+_pools: 'OrderedDict[Tuple[str, str, str, str], PromptPool]' = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_prompt_pool(url: str, api_key: str, model: str, context: str = '', target_depth: int = 5) -> PromptPool:
+    """Return the process-wide pool for an Ollama configuration"""
+    # Context comes from the request, so it must not be able to mint new pools
+    if context not in POOL_CONTEXTS:
+        context = ''
+    key = (url, api_key, model, context)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = PromptPool(url, api_key, model, context, target_depth)
+            _pools[key] = pool
+            while len(_pools) > MAX_POOLS:
+                _pools.popitem(last=False)
+        _pools.move_to_end(key)
+        pool.target_depth = target_depth
+        return pool
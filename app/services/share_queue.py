@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from PIL import Image
+
+from ..utils.metrics import SHARE_SEND_SECONDS
+from ..utils.settings_store import SettingsStore
+from .derivatives import ensure_derivative
+from .email_service import SMTPSender
+from .sms_service import SMSGateClient
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5.0  # seconds; doubles after each failed attempt
+BATCH_SIZE = 20
+# A job claimed this long ago by a worker that died is handed out again
+CLAIM_TIMEOUT = 300.0
+POLL_INTERVAL = 5.0
+# After a wake-up, wait briefly so shares arriving together go out as one batch
+BATCH_WINDOW = 0.5
+# Originals larger than this are emailed as a downsized JPEG instead (animations are always sent as they are)
+EMAIL_ATTACHMENT_MAX_BYTES = int(os.getenv('EMAIL_ATTACHMENT_MAX_KB', '1024') or 1024) * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind            TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at      REAL,
+    last_error      TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+)
+"""
+
+
+class ShareQueue:
+    """Durable SQLite outbox for email and SMS shares.
+
+    Any number of workers may enqueue and dispatch; jobs are claimed in an
+    immediate transaction so each one is sent by a single dispatcher.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # The journal mode cannot be changed inside the immediate transaction _connect opens
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                'INSERT INTO outbox (kind, payload, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (kind, json.dumps(payload), now, now, now),
+            )
+            return cur.lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM outbox WHERE id = ?', (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def claim(self, limit: int = BATCH_SIZE) -> List[Dict[str, Any]]:
+        """Mark up to ``limit`` due jobs as sending and return them"""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT * FROM outbox
+                   WHERE (status = 'pending' AND next_attempt_at <= ?)
+                      OR (status = 'sending' AND claimed_at < ?)
+                   ORDER BY id LIMIT ?""",
+                (now, now - CLAIM_TIMEOUT, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = 'sending', claimed_at = ?, updated_at = ? WHERE id = ?",
+                [(now, now, row['id']) for row in rows],
+            )
+        return [self._row(row) for row in rows]
+
+    def mark_sent(self, job_ids: List[int]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'sent', last_error = NULL, updated_at = ? WHERE id = ?",
+                [(now, job_id) for job_id in job_ids],
+            )
+
+    def mark_failed(self, job_ids: List[int], error: str) -> None:
+        """Record a failed attempt, scheduling a retry with exponential backoff"""
+        now = time.time()
+        with self._connect() as conn:
+            for job_id in job_ids:
+                row = conn.execute('SELECT attempts FROM outbox WHERE id = ?', (job_id,)).fetchone()
+                if row is None:
+                    continue
+                attempts = row['attempts'] + 1
+                status = 'failed' if attempts >= MAX_ATTEMPTS else 'pending'
+                conn.execute(
+                    'UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? WHERE id = ?',
+                    (status, attempts, now + BACKOFF_BASE * (2 ** (attempts - 1)), error, now, job_id),
+                )
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+
+class ShareDispatcher:
+    """Background thread that drains the outbox in batches"""
+
+    def __init__(self, queue: ShareQueue, settings_path: str, photos_folder: str) -> None:
+        self.queue = queue
+        self.settings_path = settings_path
+        self.photos_folder = photos_folder
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def start(self) -> None:
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name='share-dispatcher', daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            if self._wake.wait(POLL_INTERVAL):
+                time.sleep(BATCH_WINDOW)
+            self._wake.clear()
+            try:
+                while self.dispatch_once():
+                    pass
+            except Exception as e:
+                logger.error(f"Share dispatcher error: {str(e)}")
+
+    def dispatch_once(self) -> int:
+        """Send one batch; returns the number of jobs claimed"""
+        jobs = self.queue.claim()
+        if not jobs:
+            return 0
+        settings = SettingsStore(self.settings_path).snapshot()
+        emails = [job for job in jobs if job['kind'] == 'email']
+        sms = [job for job in jobs if job['kind'] == 'sms']
+        if emails:
+            self._send_emails(emails, settings)
+        if sms:
+            self._send_sms(sms, settings)
+        return len(jobs)
+
+    def _attachment(self, filename: str) -> Tuple[str, str]:
+        """Return (path, name) of the file to attach for a photo"""
+        path = os.path.join(self.photos_folder, filename)
+        if os.path.getsize(path) <= EMAIL_ATTACHMENT_MAX_BYTES:
+            return path, filename
+        try:
+            with Image.open(path) as img:
+                animated = getattr(img, 'is_animated', False)
+            # The email derivative is a still; a GIF/WebP burst would lose its animation
+            if animated:
+                return path, filename
+            derivative = ensure_derivative(self.photos_folder, 'email', filename)
+        except OSError:
+            # Not an image Pillow can read (burst videos): send the original
+            return path, filename
+        return derivative, f"{os.path.splitext(filename)[0]}.jpg"
+
+    def _fail_batch(self, channel: str, jobs: List[Dict[str, Any]], error: Exception) -> None:
+        """Reschedule a whole claimed batch when it could not even be set up (bad settings)"""
+        logger.error(f"Could not set up {channel} share batch: {str(error)}")
+        self.queue.mark_failed([job['id'] for job in jobs], str(error))
+
+    def _send_emails(self, jobs: List[Dict[str, Any]], settings) -> None:
+        try:
+            smtp = settings['smtp']
+            from_email = smtp['from_email'] or smtp['user']
+            # One authenticated connection for the whole batch
+            sender = SMTPSender(smtp['host'], int(smtp['port']), smtp['user'], smtp['password'], smtp.get('use_tls', True))
+        except Exception as e:
+            self._fail_batch('email', jobs, e)
+            return
+        with sender:
+            for job in jobs:
+                payload = job['payload']
+                start = time.perf_counter()
+                try:
+                    attachment_path, attachment_name = self._attachment(payload['filename'])
+                    sender.send(
+                        from_email=from_email,
+                        to_email=payload['email'],
+                        subject='Your PhotoBooth Photo',
+                        body='Attached is your photobooth photo. Have fun!',
+                        attachment_path=attachment_path,
+                        attachment_name=attachment_name,
+                    )
+                    SHARE_SEND_SECONDS.observe(time.perf_counter() - start, channel='email', outcome='sent')
+                    self.queue.mark_sent([job['id']])
+                except Exception as e:
+                    SHARE_SEND_SECONDS.observe(time.perf_counter() - start, channel='email', outcome='failed')
+                    logger.error(f"Email share {job['id']} failed: {str(e)}")
+                    self.queue.mark_failed([job['id']], str(e))
+
+    def _send_sms(self, jobs: List[Dict[str, Any]], settings) -> None:
+        try:
+            sms = settings['sms']
+            client = SMSGateClient(api_base=sms['api_base'], username=sms['username'], password=sms['password'])
+        except Exception as e:
+            self._fail_batch('sms', jobs, e)
+            return
+        # Identical messages (same photo to several phones) go out in one request
+        groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for job in jobs:
+            groups[job['payload']['message']].append(job)
+        for message, group in groups.items():
+            ids = [job['id'] for job in group]
+            phones = list(dict.fromkeys(job['payload']['phone'] for job in group))
+            start = time.perf_counter()
+            try:
+                client.send_sms(message=message, phone_numbers=phones)
+                SHARE_SEND_SECONDS.observe(time.perf_counter() - start, channel='sms', outcome='sent')
+                self.queue.mark_sent(ids)
+            except Exception as e:
+                SHARE_SEND_SECONDS.observe(time.perf_counter() - start, channel='sms', outcome='failed')
+                logger.error(f"SMS share {ids} failed: {str(e)}")
+                self.queue.mark_failed(ids, str(e))
+
+
+_dispatchers: Dict[str, ShareDispatcher] = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_share_dispatcher(queue_path: str, settings_path: str, photos_folder: str) -> ShareDispatcher:
+    """Return this process's dispatcher for an outbox, starting it if needed"""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(queue_path)
+        if dispatcher is None:
+            dispatcher = ShareDispatcher(ShareQueue(queue_path), settings_path, photos_folder)
+            _dispatchers[queue_path] = dispatcher
+        dispatcher.start()
+        return dispatcher
@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: calls are only coalesced within a process
+    fcntl = None
+
+from ..utils.metrics import COALESCED_CALLS
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_FOLDER = os.getenv('SINGLE_FLIGHT_FOLDER', os.path.join(tempfile.gettempdir(), 'photobooth-single-flight'))
+# A worker gives up waiting for another worker's call after this long and calls upstream itself
+LOCK_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', '60') or 60)
+LOCK_POLL_INTERVAL = 0.02
+# Results are only handed to callers that were already waiting; files are pruned after this
+RESULT_TTL = 30
+PRUNE_INTERVAL = 60
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Share one upstream call between identical concurrent requests.
+
+    Within a process, callers with the same key wait for the first one and get
+    its result or exception. Across gunicorn workers, one leader per key holds
+    a lock file; it leaves its result next to the lock for a few seconds so
+    workers that were waiting on the lock reuse it instead of calling again.
+    Results are bytes so they can be shared through a file.
+    """
+
+    def __init__(self, name: str, folder: str = SINGLE_FLIGHT_FOLDER) -> None:
+        self.name = name
+        self.folder = os.path.join(folder, name)
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[str, 'asyncio.Future[bytes]'] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def do(self, key: str, fn: Callable[[], bytes]) -> bytes:
+        """Return ``fn()``, or the result of an identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_CALLS.inc(name=self.name, scope='process')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._across_workers(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Event-loop counterpart of ``do`` for the ASGI app"""
+        task = self._async_calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._lead_async(key, fn))
+            self._async_calls[key] = task
+            task.add_done_callback(lambda _: self._async_calls.pop(key, None))
+        else:
+            COALESCED_CALLS.inc(name=self.name, scope='process')
+        # Shielded so one client disconnecting does not cancel the call for the rest
+        return await asyncio.shield(task)
+
+    async def _lead_async(self, key: str, fn: Callable[[], Awaitable[bytes]]) -> bytes:
+        started = time.time()
+        path = self._path(key)
+        # Waiting on another worker's lock must not block the event loop
+        lock_file = await asyncio.to_thread(self._acquire, path)
+        try:
+            result = self._shared_result(path, started)
+            if result is None:
+                result = await fn()
+                self._publish(path, result)
+            return result
+        finally:
+            self._release(lock_file)
+
+    def _across_workers(self, key: str, fn: Callable[[], bytes]) -> bytes:
+        started = time.time()
+        path = self._path(key)
+        lock_file = self._acquire(path)
+        try:
+            result = self._shared_result(path, started)
+            if result is None:
+                result = fn()
+                self._publish(path, result)
+            return result
+        finally:
+            self._release(lock_file)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def _acquire(self, path: str) -> Optional[Any]:
+        if fcntl is None:
+            return None
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            lock_file = open(f"{path}.lock", 'a')
+        except OSError as e:
+            logger.warning(f"Single-flight lock unavailable: {str(e)}")
+            return None
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Keeps a busy lock file from being pruned
+                os.utime(lock_file.fileno())
+                return lock_file
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    return None
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    @staticmethod
+    def _release(lock_file: Optional[Any]) -> None:
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _shared_result(self, path: str, started: float) -> Optional[bytes]:
+        """A result another worker published while this one waited for the lock"""
+        if fcntl is None:
+            return None
+        result_path = f"{path}.result"
+        try:
+            if os.path.getmtime(result_path) < started:
+                return None
+            with open(result_path, 'rb') as f:
+                result = f.read()
+        except OSError:
+            return None
+        COALESCED_CALLS.inc(name=self.name, scope='host')
+        return result
+
+    def _publish(self, path: str, result: bytes) -> None:
+        if fcntl is None:
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(result)
+            os.replace(tmp_path, f"{path}.result")
+        except OSError as e:
+            logger.warning(f"Could not share single-flight result: {str(e)}")
+        self._prune()
+
+    def _prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.folder, name)
+            try:
+                # Removing a lock file someone holds only costs one duplicate call
+                if now - os.path.getmtime(path) > RESULT_TTL:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Return the process-wide single-flight group for a kind of upstream call"""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = SingleFlight(name)
+            _flights[name] = flight
+        return flight
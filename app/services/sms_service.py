@@ -1,6 +1,8 @@
 import requests
 from typing import List
 
+from .http_client import get_session, timeout
+
 
 class SMSGateClient:
     def __init__(self, api_base: str, username: str, password: str) -> None:
@@ -10,14 +12,14 @@ class SMSGateClient:
 
     def send_sms(self, message: str, phone_numbers: List[str]) -> requests.Response:
         url = f"{self.api_base}/3rdparty/v1/message"
-        response = requests.post(
+        response = get_session().post(
             url,
             auth=(self.username, self.password),
             json={
                 "message": message,
                 "phoneNumbers": phone_numbers,
             },
-            timeout=20,
+            timeout=timeout(20),
         )
         response.raise_for_status()
         return response
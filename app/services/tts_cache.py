@@ -0,0 +1,134 @@
+import os
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Clip formats on disk: MP3 from remote services, WAV from Piper without ffmpeg
+CLIP_EXTENSIONS = ('.mp3', '.wav')
+# Eviction frees space down to this share of the cap, so it does not run on every write
+EVICT_TO = 0.9
+
+
+def cache_key(service: str, voice: str, text: str) -> str:
+    """Content address for a synthesized clip; also used as its ETag"""
+    return hashlib.sha256('\0'.join((service, voice, text)).encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """Two-tier audio cache: an in-memory LRU in front of a size-capped directory.
+
+    Disk entries are shared by all workers. Their mtime is bumped on every hit
+    so eviction removes the least recently used clips first. Each worker keeps
+    a running estimate of the directory size and only rescans it once the
+    estimate passes the cap.
+    """
+
+    def __init__(self, directory: str, memory_items: int = 64, disk_bytes: int = 200 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_total: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, extension: str = '.mp3') -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{extension}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                return audio
+
+        for extension in CLIP_EXTENSIONS:
+            path = self._path(key, extension)
+            try:
+                with open(path, 'rb') as f:
+                    audio = f.read()
+                os.utime(path)
+            except OSError:
+                continue
+            self._remember(key, audio)
+            return audio
+        return None
+
+    def put(self, key: str, audio: bytes) -> None:
+        self._remember(key, audio)
+
+        path = self._path(key, '.wav' if audio[:4] == b'RIFF' else '.mp3')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist TTS clip {key}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._disk_total is not None:
+                self._disk_total += len(audio)
+            scan = self._disk_total is None or self._disk_total > self.disk_bytes
+        if scan:
+            self._evict_disk()
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        with self._lock:
+            self._memory[key] = audio
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Rescan the directory (other workers write to it too) and trim it if over the cap"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(CLIP_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total > self.disk_bytes:
+            target = self.disk_bytes * EVICT_TO
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= target:
+                    break
+        with self._lock:
+            self._disk_total = total
+
+
+_caches: Dict[str, TTSCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_tts_cache(directory: str) -> TTSCache:
+    """Return the process-wide TTS cache for a directory"""
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = TTSCache(
+                directory,
+                memory_items=int(os.getenv('TTS_CACHE_MEMORY_ITEMS', '64') or 64),
+                disk_bytes=int(os.getenv('TTS_CACHE_DISK_MB', '200') or 200) * 1024 * 1024,
+            )
+            _caches[directory] = cache
+        return cache
@@ -0,0 +1,273 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Providers tried after the requested one, in order
+FAILOVER_CHAIN = [s.strip() for s in os.getenv('TTS_FAILOVER_CHAIN', 'elevenlabs,microsoft,google,piper').split(',') if s.strip()]
+# Start the next provider if the current one has not answered after this long (or its p95, if sooner)
+HEDGE_AFTER = int(os.getenv('TTS_HEDGE_MS', '1500') or 1500) / 1000
+# Give up and let the browser speak after this long
+LATENCY_BUDGET = int(os.getenv('TTS_LATENCY_BUDGET_MS', '5000') or 5000) / 1000
+# Never hedge sooner than this, so a fast provider is not doubled on every request
+HEDGE_FLOOR = 0.2
+# Rolling window of calls per provider
+WINDOW = 20
+MIN_SAMPLES = 5
+# The breaker opens on this many failures in a row, or on half the window failing
+CONSECUTIVE_FAILURES = 3
+ERROR_RATE = 0.5
+COOLDOWN = 30.0
+EXECUTOR_THREADS = 32
+
+Candidate = Tuple[str, str]
+
+
+class ProviderHealth:
+    """Rolling latency and errors for one TTS provider, with a circuit breaker.
+
+    While the breaker is open the provider is skipped. After ``COOLDOWN`` one
+    request is let through as a trial; its outcome closes or reopens it.
+    """
+
+    def __init__(self, service: str) -> None:
+        self.service = service
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=WINDOW)
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+        self._last_error = ''
+
+    def available(self) -> bool:
+        """Whether ``allow`` would let a call through, without claiming the half-open trial"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.time()
+            if now - self._opened_at < COOLDOWN:
+                return False
+            return self._trial_at is None or now - self._trial_at >= COOLDOWN
+
+    def allow(self) -> bool:
+        """Admit a call that is about to be made; in half-open state this takes the one trial"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.time()
+            if now - self._opened_at < COOLDOWN:
+                return False
+            # Half-open: one trial at a time; a trial that never reported back expires
+            if self._trial_at is not None and now - self._trial_at < COOLDOWN:
+                return False
+            self._trial_at = now
+            return True
+
+    def record(self, latency: float, ok: bool, error: str = '') -> None:
+        with self._lock:
+            self._calls.append((ok, latency))
+            if ok:
+                if self._opened_at is not None:
+                    logger.info(f"TTS provider {self.service} recovered")
+                self._consecutive = 0
+                self._opened_at = None
+                self._trial_at = None
+                return
+            self._consecutive += 1
+            self._last_error = error
+            errors = sum(1 for call_ok, _ in self._calls if not call_ok)
+            tripped = self._consecutive >= CONSECUTIVE_FAILURES or (
+                len(self._calls) >= MIN_SAMPLES * 2 and errors / len(self._calls) >= ERROR_RATE)
+            if self._opened_at is not None or tripped:
+                if self._opened_at is None:
+                    logger.warning(f"TTS provider {self.service} skipped for {COOLDOWN:.0f}s after repeated failures: {error}")
+                self._opened_at = time.time()
+                self._trial_at = None
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(latency for ok, latency in self._calls if ok)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def hedge_after(self) -> float:
+        p95 = self.p95()
+        return HEDGE_AFTER if p95 is None else min(HEDGE_AFTER, max(HEDGE_FLOOR, p95))
+
+    def status(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        with self._lock:
+            calls = len(self._calls)
+            errors = sum(1 for ok, _ in self._calls if not ok)
+            if self._opened_at is None:
+                state = 'closed'
+            elif time.time() - self._opened_at < COOLDOWN:
+                state = 'open'
+            else:
+                state = 'half_open'
+            return {
+                'service': self.service,
+                'state': state,
+                'calls': calls,
+                'error_rate': round(errors / calls, 3) if calls else None,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'consecutive_failures': self._consecutive,
+                'last_error': self._last_error,
+            }
+
+
+_providers: Dict[str, ProviderHealth] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider_health(service: str) -> ProviderHealth:
+    """Return the process-wide health state for a TTS provider"""
+    with _providers_lock:
+        health = _providers.get(service)
+        if health is None:
+            health = ProviderHealth(service)
+            _providers[service] = health
+        return health
+
+
+def provider_status() -> List[Dict[str, Any]]:
+    with _providers_lock:
+        providers = list(_providers.values())
+    return [health.status() for health in providers]
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=EXECUTOR_THREADS, thread_name_prefix='tts-failover')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _launchable(candidates: List[Candidate]) -> List[Candidate]:
+    # Only a peek: the half-open trial is taken by _next_allowed when a call actually starts
+    return [c for c in candidates if get_provider_health(c[0]).available()]
+
+
+def _next_allowed(queue: List[Candidate]) -> Optional[Candidate]:
+    """Pop candidates until one is admitted by its breaker"""
+    while queue:
+        candidate = queue.pop(0)
+        if get_provider_health(candidate[0]).allow():
+            return candidate
+    return None
+
+
+def _no_answer(launched: bool, budget: float) -> BaseException:
+    if not launched:
+        return RuntimeError("Every TTS provider is skipped after repeated failures")
+    return TimeoutError(f"No TTS provider answered within {budget:.1f}s")
+
+
+def first_success(candidates: List[Candidate], call: Callable[[str, str], bytes],
+                  budget: float = LATENCY_BUDGET) -> Tuple[Candidate, bytes]:
+    """Run ``call`` down the chain and return the first provider to answer.
+
+    The next candidate starts as soon as the current one fails, or is hedged
+    in once it has taken longer than its usual p95. Calls that lose keep
+    running in the background. Raises the first error if nothing answers
+    within ``budget``, or at once if every provider's breaker is open.
+    """
+    queue = _launchable(candidates)
+    executor = _get_executor()
+    deadline = time.monotonic() + budget
+    pending: Dict[Future, Candidate] = {}
+    first_error: Optional[BaseException] = None
+    next_launch = time.monotonic()
+    launched = False
+
+    while True:
+        now = time.monotonic()
+        if queue and (now >= next_launch or not pending):
+            candidate = _next_allowed(queue)
+            if candidate is not None:
+                pending[executor.submit(call, *candidate)] = candidate
+                next_launch = now + get_provider_health(candidate[0]).hedge_after()
+                launched = True
+        if not pending or now >= deadline:
+            break
+        wake = min(deadline, next_launch) if queue else deadline
+        done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            candidate = pending.pop(future)
+            try:
+                return candidate, future.result()
+            except Exception as e:
+                first_error = first_error or e
+                # Don't wait out the hedge delay after a failure
+                next_launch = time.monotonic()
+
+    if first_error is None:
+        first_error = _no_answer(launched, budget)
+    raise first_error
+
+
+_background: Set['asyncio.Task[bytes]'] = set()
+
+
+async def first_success_async(candidates: List[Candidate], call: Callable[[str, str], Awaitable[bytes]],
+                              budget: float = LATENCY_BUDGET) -> Tuple[Candidate, bytes]:
+    """Event-loop counterpart of ``first_success``"""
+    queue = _launchable(candidates)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    pending: Dict['asyncio.Task[bytes]', Candidate] = {}
+    first_error: Optional[BaseException] = None
+    next_launch = loop.time()
+    launched = False
+
+    try:
+        while True:
+            now = loop.time()
+            if queue and (now >= next_launch or not pending):
+                candidate = _next_allowed(queue)
+                if candidate is not None:
+                    pending[asyncio.ensure_future(call(*candidate))] = candidate
+                    next_launch = now + get_provider_health(candidate[0]).hedge_after()
+                    launched = True
+            if not pending or now >= deadline:
+                break
+            wake = min(deadline, next_launch) if queue else deadline
+            done, _ = await asyncio.wait(list(pending), timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                candidate = pending.pop(task)
+                try:
+                    return candidate, task.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    next_launch = loop.time()
+    finally:
+        # Losers finish in the background (and fill the cache); keep them referenced
+        for task in pending:
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+            task.add_done_callback(_consume)
+
+    if first_error is None:
+        first_error = _no_answer(launched, budget)
+    raise first_error
+
+
+def _consume(task: 'asyncio.Task[bytes]') -> None:
+    # Avoids "exception was never retrieved" for losing calls
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Errors kept in the status file
+MAX_ERRORS = 5
+
+
+class TTSWarmup:
+    """Synthesizes the clips kiosks are about to ask for, in a background thread.
+
+    Progress goes to a small JSON file so whichever worker answers the status
+    request can report it. A newer warm-up, in this worker or another one,
+    supersedes a running one.
+    """
+
+    def __init__(self, status_path: str) -> None:
+        self.status_path = status_path
+        self._lock = threading.Lock()
+
+    def start(self, service: str, voice: str, texts: List[str], fetch: Callable[[str], bool]) -> None:
+        """Warm ``texts`` in the background; ``fetch`` returns False when a clip was already cached"""
+        status = {
+            'state': 'running',
+            'service': service,
+            'voice': voice,
+            'total': len(texts),
+            'done': 0,
+            'synthesized': 0,
+            'cached': 0,
+            'failed': 0,
+            'errors': [],
+            'started_at': time.time(),
+            'finished_at': None,
+            'pid': os.getpid(),
+        }
+        self._write(status)
+        threading.Thread(target=self._run, args=(status, texts, fetch), name='tts-warmup', daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        try:
+            with open(self.status_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'state': 'idle'}
+
+    def _run(self, status: Dict[str, Any], texts: List[str], fetch: Callable[[str], bool]) -> None:
+        start = time.perf_counter()
+        for text in texts:
+            if self._superseded(status):
+                logger.info("TTS warm-up superseded by a newer one")
+                return
+            try:
+                if fetch(text):
+                    status['synthesized'] += 1
+                else:
+                    status['cached'] += 1
+            except Exception as e:
+                status['failed'] += 1
+                if len(status['errors']) < MAX_ERRORS:
+                    status['errors'].append(f"{text[:40]}: {str(e)}")
+            status['done'] += 1
+            self._write(status)
+        if self._superseded(status):
+            return
+        status['state'] = 'done'
+        status['finished_at'] = time.time()
+        self._write(status)
+        logger.info(f"TTS warm-up for {status['service']} finished in {time.perf_counter() - start:.1f}s: "
+                    f"{status['synthesized']} synthesized, {status['cached']} cached, {status['failed']} failed")
+
+    def _superseded(self, status: Dict[str, Any]) -> bool:
+        current = self.status()
+        return (current.get('started_at') or 0) > status['started_at']
+
+    def _write(self, status: Dict[str, Any]) -> None:
+        tmp_path = f"{self.status_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(status, f)
+                os.replace(tmp_path, self.status_path)
+            except OSError as e:
+                logger.warning(f"Could not write TTS warm-up status: {str(e)}")
+
+
+_warmups: Dict[str, TTSWarmup] = {}
+_warmups_lock = threading.Lock()
+
+
+def get_tts_warmup(status_path: str) -> TTSWarmup:
+    """Return the process-wide warm-up tracker for a status file"""
+    with _warmups_lock:
+        warmup: Optional[TTSWarmup] = _warmups.get(status_path)
+        if warmup is None:
+            warmup = TTSWarmup(status_path)
+            _warmups[status_path] = warmup
+        return warmup
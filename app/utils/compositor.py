@@ -0,0 +1,72 @@
+from typing import List, Optional, Tuple
+from PIL import Image
+
+Box = Tuple[int, int, int, int]
+
+# Frames are classified in square tiles; smaller tiles blend fewer pixels but cost more paste calls
+TILE_SIZE = 64
+
+
+def has_transparency(image: Image.Image) -> bool:
+    if image.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La'):
+        return image.getchannel('A').getextrema()[0] < 255
+    return 'transparency' in image.info
+
+
+class FrameOverlay:
+    """A frame at one camera size, pre-split into regions by how it must be applied.
+
+    Tiles the frame fully covers are copied, tiles it leaves fully transparent
+    are skipped, and only the rest are alpha-blended. Adjacent tiles of the same
+    kind in a row are merged into one box.
+    """
+
+    def __init__(self, frame: Image.Image) -> None:
+        frame = frame.convert('RGBA')
+        self.size = frame.size
+        self.rgb = frame.convert('RGB')
+        self.alpha = frame.getchannel('A')
+        # Everything outside this box is fully transparent and never touched
+        self.bbox: Optional[Box] = self.alpha.getbbox()
+        self.opaque_boxes, self.blend_boxes = self._classify()
+        # Pieces are cut once here so applying the frame is only pastes
+        self._opaque = [(box, self.rgb.crop(box)) for box in self.opaque_boxes]
+        self._blend = [(box, self.rgb.crop(box), self.alpha.crop(box)) for box in self.blend_boxes]
+
+    def _classify(self) -> Tuple[List[Box], List[Box]]:
+        opaque: List[Box] = []
+        blend: List[Box] = []
+        if self.bbox is None:
+            return opaque, blend
+        left, top, right, bottom = self.bbox
+        for y in range(top, bottom, TILE_SIZE):
+            y2 = min(y + TILE_SIZE, bottom)
+            run_kind, run_start = None, left
+            for x in range(left, right, TILE_SIZE):
+                low, high = self.alpha.crop((x, y, min(x + TILE_SIZE, right), y2)).getextrema()
+                kind = None if high == 0 else 'opaque' if low == 255 else 'blend'
+                if kind != run_kind:
+                    if run_kind is not None:
+                        (opaque if run_kind == 'opaque' else blend).append((run_start, y, x, y2))
+                    run_kind, run_start = kind, x
+            if run_kind is not None:
+                (opaque if run_kind == 'opaque' else blend).append((run_start, y, right, y2))
+        return opaque, blend
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        """Return ``image`` with the frame drawn over it.
+
+        Opaque camera images stay in RGB: a masked paste gives the same result
+        as ``alpha_composite`` over an opaque background.
+        """
+        if image.size != self.size:
+            raise ValueError(f"Frame overlay is {self.size}, image is {image.size}")
+        if has_transparency(image):
+            return Image.alpha_composite(image.convert('RGBA'), Image.merge('RGBA', (*self.rgb.split(), self.alpha)))
+
+        result = image.convert('RGB') if image.mode != 'RGB' else image.copy()
+        for box, piece in self._opaque:
+            result.paste(piece, box)
+        for box, piece, mask in self._blend:
+            result.paste(piece, box, mask)
+        return result
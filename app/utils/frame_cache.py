@@ -0,0 +1,86 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+from PIL import Image
+
+from .compositor import FrameOverlay
+
+logger = logging.getLogger(__name__)
+
+Size = Tuple[int, int]
+
+
+class FrameOverlayCache:
+    """LRU cache of decoded, pre-resized frame overlays with their alpha regions precomputed.
+
+    Entries are keyed by (frame name, file mtime, target size) so replacing a
+    frame on disk naturally misses the old entry.
+    """
+
+    def __init__(self, max_entries: int = 16) -> None:
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, float, Size], FrameOverlay]' = OrderedDict()
+        self._sizes: Set[Size] = set()
+        self._lock = threading.Lock()
+
+    def get(self, folder: str, frame_name: str, size: Size) -> Optional[FrameOverlay]:
+        """Return the frame resized to ``size``, or None if the frame does not exist"""
+        path = os.path.join(folder, frame_name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        key = (frame_name, mtime, tuple(size))
+        with self._lock:
+            overlay = self._entries.get(key)
+            if overlay is not None:
+                self._entries.move_to_end(key)
+                return overlay
+
+        overlay = self._load(path, size)
+        with self._lock:
+            self._sizes.add(tuple(size))
+            self._entries[key] = overlay
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return overlay
+
+    def warm(self, folder: str, frame_name: str) -> None:
+        """Preload a frame for every camera size seen so far (or its native size)"""
+        with self._lock:
+            sizes = list(self._sizes)
+        if not sizes:
+            try:
+                with Image.open(os.path.join(folder, frame_name)) as img:
+                    sizes = [img.size]
+            except Exception as e:
+                logger.warning(f"Could not warm frame {frame_name}: {str(e)}")
+                return
+        for size in sizes:
+            self.get(folder, frame_name, size)
+
+    def invalidate(self, frame_name: str) -> None:
+        """Drop every cached overlay for a frame"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == frame_name]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _load(path: str, size: Size) -> FrameOverlay:
+        with Image.open(path) as img:
+            frame_img = img.convert('RGBA')
+        if frame_img.size != tuple(size):
+            frame_img = frame_img.resize(size, Image.LANCZOS)
+        return FrameOverlay(frame_img)
+
+
+# Process-wide cache shared by the photobooth and settings blueprints
+frame_cache = FrameOverlayCache(max_entries=int(os.getenv('FRAME_CACHE_SIZE', '16') or 16))
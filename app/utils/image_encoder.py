@@ -0,0 +1,62 @@
+from typing import Any, Dict, Mapping, Tuple
+from PIL import Image
+
+# Supported output formats: settings value -> (Pillow format, file extension)
+PHOTO_FORMATS: Dict[str, Tuple[str, str]] = {
+    'png': ('PNG', '.png'),
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+
+PHOTO_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# What Pillow can open, including animated GIF bursts
+IMAGE_EXTENSIONS = PHOTO_EXTENSIONS + ('.gif',)
+# Everything the booth can produce, including burst animations
+MEDIA_EXTENSIONS = IMAGE_EXTENSIONS + ('.mp4',)
+
+
+def _clamp(value: Any, low: int, high: int, default: int) -> int:
+    try:
+        return max(low, min(high, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def output_format(photo_settings: Mapping[str, Any]) -> str:
+    fmt = str(photo_settings.get('format', 'png')).lower()
+    return fmt if fmt in PHOTO_FORMATS else 'png'
+
+
+def file_extension(photo_settings: Mapping[str, Any]) -> str:
+    return PHOTO_FORMATS[output_format(photo_settings)][1]
+
+
+def save_options(photo_settings: Mapping[str, Any]) -> Dict[str, Any]:
+    """Build Pillow ``save()`` keyword arguments for the configured format"""
+    fmt = output_format(photo_settings)
+    if fmt == 'jpeg':
+        return {
+            'format': 'JPEG',
+            'quality': _clamp(photo_settings.get('jpeg_quality'), 1, 95, 90),
+            'optimize': True,
+            'progressive': True,
+        }
+    if fmt == 'webp':
+        return {
+            'format': 'WEBP',
+            'quality': _clamp(photo_settings.get('webp_quality'), 1, 100, 85),
+            'method': 4,
+        }
+    return {
+        'format': 'PNG',
+        'compress_level': _clamp(photo_settings.get('png_compress_level'), 0, 9, 6),
+    }
+
+
+def encode_image(image: Image.Image, fp: Any, photo_settings: Mapping[str, Any]) -> None:
+    """Encode ``image`` to a path or file object using the configured format"""
+    options = save_options(photo_settings)
+    if options['format'] in ('JPEG', 'WEBP') and image.mode != 'RGB':
+        # Photos are opaque once composited; dropping alpha keeps files small
+        image = image.convert('RGB')
+    image.save(fp, **options)
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' files are kept instead of folded
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Each process writes its totals here; /metrics adds up every file
+METRICS_FOLDER = os.getenv('METRICS_FOLDER', os.path.join(tempfile.gettempdir(), 'photobooth-metrics'))
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_SECONDS', '5') or 5)
+# Totals of exited processes, folded into one file so the folder does not grow with every worker restart
+RETIRED_FILE = 'retired.json'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._registry = registry
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._registry.touch()
+
+    def dump(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    @staticmethod
+    def merge(total: Dict[LabelValues, list], entries: List[list]) -> None:
+        for key, value in entries:
+            current = total.setdefault(tuple(key), [0])
+            current[0] += value
+
+    @staticmethod
+    def entries(total: Dict[LabelValues, list]) -> List[list]:
+        """Inverse of ``merge``: totals back in ``dump`` format"""
+        return [[list(key), value[0]] for key, value in total.items()]
+
+    def render(self, total: Dict[LabelValues, list]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value[0]:g}" for key, value in sorted(total.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count in each bucket (non-cumulative) + overflow, sum]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+        self._registry.touch()
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def dump(self) -> List[list]:
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._values.items()]
+
+    @staticmethod
+    def merge(total: Dict[LabelValues, list], entries: List[list]) -> None:
+        for key, counts, value_sum in entries:
+            current = total.setdefault(tuple(key), [[0] * len(counts), 0.0])
+            current[0] = [a + b for a, b in zip(current[0], counts)]
+            current[1] += value_sum
+
+    @staticmethod
+    def entries(total: Dict[LabelValues, list]) -> List[list]:
+        return [[list(key), list(counts), value_sum] for key, (counts, value_sum) in total.items()]
+
+    def render(self, total: Dict[LabelValues, list]) -> List[str]:
+        lines = []
+        for key, (counts, value_sum) in sorted(total.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {value_sum:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics shared by all gunicorn workers through one snapshot file per process.
+
+    Observations only touch memory; a background thread writes the process's
+    totals every few seconds. Files of exited workers are folded into
+    ``RETIRED_FILE`` so counters never go backwards and the folder stays small.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._pid: Optional[int] = None
+        self._file: Optional[str] = None
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return Counter(self, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return Histogram(self, name, documentation, labelnames, buckets=buckets)
+
+    def touch(self) -> None:
+        self._dirty = True
+        if self._pid != os.getpid():
+            self._start()
+
+    def _start(self) -> None:
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # Forked from a process that already counted: start from zero
+                for metric in self._metrics.values():
+                    with metric._lock:
+                        metric._values.clear()
+            self._pid = pid
+            # Start time in the name so a recycled pid never overwrites an old worker's totals
+            self._file = os.path.join(self.folder, f"{pid}-{int(time.time() * 1000)}.json")
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write this process's totals if anything changed since the last write"""
+        if not self._dirty or self._file is None or self._pid != os.getpid():
+            return
+        self._dirty = False
+        data = {name: metric.dump() for name, metric in self._metrics.items()}
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp_path = f"{self._file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._file)
+        except OSError as e:
+            self._dirty = True
+            logger.warning(f"Could not write metrics: {str(e)}")
+
+    def render(self) -> str:
+        """Prometheus text exposition of the totals across every process"""
+        self.flush()
+        self._fold_exited()
+        totals: Dict[str, Dict[LabelValues, list]] = {name: {} for name in self._metrics}
+        retired = self._read(RETIRED_FILE) or {}
+        # Files listed here were folded in, but an interrupted fold may have left them behind
+        folded = set(retired.get('folded', []))
+        self._merge(totals, retired.get('metrics', {}))
+        for filename in self._snapshots():
+            if filename not in folded:
+                self._merge(totals, self._read(filename) or {})
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(totals[name]))
+        return '\n'.join(lines) + '\n'
+
+    def _fold_exited(self) -> None:
+        """Add the files of processes that are gone to ``RETIRED_FILE`` and delete them"""
+        if fcntl is None:
+            return
+        try:
+            lock_file = open(os.path.join(self.folder, f"{RETIRED_FILE}.lock"), 'a')
+        except OSError:
+            return
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another worker is folding right now
+                return
+            retired = self._read(RETIRED_FILE) or {}
+            for filename in retired.get('folded', []):
+                self._remove(filename)
+            exited = [n for n in self._snapshots() if not _process_alive(n)]
+            if not exited and not retired.get('folded'):
+                return
+
+            totals: Dict[str, Dict[LabelValues, list]] = {name: {} for name in self._metrics}
+            self._merge(totals, retired.get('metrics', {}))
+            for filename in exited:
+                self._merge(totals, self._read(filename) or {})
+            data = {
+                'metrics': {name: self._metrics[name].entries(total) for name, total in totals.items()},
+                'folded': exited,
+            }
+            try:
+                tmp_path = os.path.join(self.folder, f"{RETIRED_FILE}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, os.path.join(self.folder, RETIRED_FILE))
+            except OSError as e:
+                logger.warning(f"Could not fold metrics of exited workers: {str(e)}")
+                return
+            for filename in exited:
+                self._remove(filename)
+
+    def _snapshots(self) -> List[str]:
+        try:
+            return [n for n in os.listdir(self.folder) if n.endswith('.json') and n != RETIRED_FILE]
+        except OSError:
+            return []
+
+    def _read(self, filename: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.folder, filename), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, filename: str) -> None:
+        try:
+            os.remove(os.path.join(self.folder, filename))
+        except OSError:
+            pass
+
+    def _merge(self, totals: Dict[str, Dict[LabelValues, list]], data: Dict[str, List[list]]) -> None:
+        for name, entries in data.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(totals[name], entries)
+
+
+def _process_alive(filename: str) -> bool:
+    """Whether the process that wrote ``<pid>-<start>.json`` is still running"""
+    try:
+        pid = int(filename.split('-', 1)[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to another user
+        return True
+    return True
+
+
+registry = Registry(METRICS_FOLDER)
+
+# Hot-path metrics, defined once here so every worker writes the same set
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'photobooth_http_request_seconds', 'Time to handle an HTTP request', ['endpoint', 'method', 'status'])
+PHOTO_STAGE_SECONDS = registry.histogram(
+    'photobooth_photo_stage_seconds', 'Time spent in each photo processing stage', ['stage'])
+PHOTO_JOBS = registry.counter(
+    'photobooth_photo_jobs_total', 'Photo jobs finished, by kind and outcome', ['kind', 'outcome'])
+TTS_UPSTREAM_SECONDS = registry.histogram(
+    'photobooth_tts_upstream_seconds', 'Time to synthesize a clip with a TTS service', ['service', 'outcome'])
+TTS_REQUESTS = registry.counter(
+    'photobooth_tts_requests_total', 'TTS requests by service and how they were answered', ['service', 'result'])
+OLLAMA_SECONDS = registry.histogram(
+    'photobooth_ollama_generation_seconds', 'Time for Ollama to produce a prompt', ['mode', 'outcome'])
+SHARE_SEND_SECONDS = registry.histogram(
+    'photobooth_share_send_seconds', 'Time to hand one email or one SMS request to the provider', ['channel', 'outcome'])
+COALESCED_CALLS = registry.counter(
+    'photobooth_coalesced_calls_total', 'Upstream calls answered by an identical call already in flight', ['name', 'scope'])
+SETTINGS_READ_SECONDS = registry.histogram(
+    'photobooth_settings_read_seconds', 'Time to read settings', ['method', 'cache'],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05))
@@ -1,6 +1,19 @@
+import copy
 import json
 import os
-from typing import Any, Dict
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, Tuple
+
+from .metrics import SETTINGS_READ_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: atomic replace still applies, without cross-process locking
+    fcntl = None
 
 
 DEFAULT_SETTINGS: Dict[str, Any] = {
@@ -20,7 +33,7 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
     "tts": {
         "enabled": True,
         "engine": os.getenv('TTS_ENGINE', 'google'),  # 'google', 'microsoft', 'elevenlabs', or 'browser'
-        "service": os.getenv('TTS_SERVICE', 'google'),  # 'google', 'microsoft', 'elevenlabs'
+        "service": os.getenv('TTS_SERVICE', 'google'),  # 'google', 'microsoft', 'elevenlabs', 'piper'
         "voice": "en",  # Default voice for the selected service
         "prompt": "Get ready! The photo will start soon.",
         "elevenlabs_api_key": os.getenv('ELEVENLABS_API_KEY', ''),  # API key for ElevenLabs
@@ -30,12 +43,56 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
         "enabled": False,
         "url": os.getenv('OLLAMA_URL', 'http://localhost:11434'),  # Remote Ollama URL
         "model": "",  # Will be selected from available models on server
-        "api_key": os.getenv('OLLAMA_API_KEY', '')  # API key if required
+        "api_key": os.getenv('OLLAMA_API_KEY', ''),  # API key if required
+        "pool_size": 5  # Prompts generated ahead of time; 0 generates on every request
+    },
+    "photos": {
+        "format": os.getenv('PHOTO_FORMAT', 'png'),  # 'png', 'jpeg', or 'webp'
+        "png_compress_level": 6,  # 0 (fastest) - 9 (smallest)
+        "jpeg_quality": 90,
+        "webp_quality": 85
     }
 }
 
 
+# Process-wide cache: path -> (file identity, frozen settings snapshot)
+_cache: Dict[str, Tuple[Tuple[int, int, int], Mapping[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _merge_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
+    merged = copy.deepcopy(DEFAULT_SETTINGS)
+    for k, v in data.items():
+        if isinstance(v, dict) and isinstance(merged.get(k), dict):
+            merged[k].update(v)
+        else:
+            merged[k] = v
+    return merged
+
+
 class SettingsStore:
+    """JSON settings file with a process-wide parsed cache.
+
+    The file is only re-parsed when its mtime, inode or size changes, and
+    writes replace it atomically so other workers never see partial JSON.
+    """
+
     def __init__(self, path: str) -> None:
         self.path = path
         self._ensure_exists()
@@ -43,24 +100,67 @@ class SettingsStore:
     def _ensure_exists(self) -> None:
         if not os.path.exists(self.path):
             os.makedirs(os.path.dirname(self.path), exist_ok=True)
-            with open(self.path, 'w', encoding='utf-8') as f:
-                json.dump(DEFAULT_SETTINGS, f, indent=2)
+            self.write(DEFAULT_SETTINGS)
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """Return the current settings as a shared, read-only mapping"""
+        start = time.perf_counter()
+        try:
+            st = os.stat(self.path)
+            identity = (st.st_mtime_ns, st.st_ino, st.st_size)
+        except OSError:
+            identity = (0, 0, 0)
+
+        with _cache_lock:
+            cached = _cache.get(self.path)
+        if cached is not None and cached[0] == identity:
+            SETTINGS_READ_SECONDS.observe(time.perf_counter() - start, method='snapshot', cache='hit')
+            return cached[1]
 
-    def read(self) -> Dict[str, Any]:
         try:
             with open(self.path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
         except Exception:
             data = DEFAULT_SETTINGS
         # Merge defaults for new keys
-        merged = DEFAULT_SETTINGS.copy()
-        for k, v in data.items():
-            if isinstance(v, dict) and isinstance(merged.get(k), dict):
-                merged[k].update(v)
-            else:
-                merged[k] = v
-        return merged
+        frozen = _freeze(_merge_defaults(data))
+        with _cache_lock:
+            _cache[self.path] = (identity, frozen)
+        SETTINGS_READ_SECONDS.observe(time.perf_counter() - start, method='snapshot', cache='miss')
+        return frozen
+
+    def read(self) -> Dict[str, Any]:
+        """Return a private, mutable copy of the current settings"""
+        with SETTINGS_READ_SECONDS.time(method='read', cache='copy'):
+            return _thaw(self.snapshot())
 
     def write(self, data: Dict[str, Any]) -> None:
-        with open(self.path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        directory = os.path.dirname(self.path)
+        with _write_lock(self.path):
+            fd, tmp_path = tempfile.mkstemp(prefix='.settings-', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(_thaw(data), f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        with _cache_lock:
+            _cache.pop(self.path, None)
+
+
+@contextmanager
+def _write_lock(path: str) -> Iterator[None]:
+    """Serialize writers across gunicorn workers with an advisory lock file"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Compare the tiled frame compositor with the previous convert + alpha_composite path.
+
+Usage: benchmark_compositing.py [frame.png] [--runs N] [--size 1920x1080]
+Without a frame, a synthetic border frame with anti-aliased edges is used.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter  # noqa: E402
+
+from app.utils.compositor import FrameOverlay  # noqa: E402
+from benchmark_encoders import synthetic_frame  # noqa: E402
+
+
+def synthetic_overlay(width: int, height: int) -> Image.Image:
+    """Opaque border and caption bar around a transparent window, with soft edges"""
+    alpha = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(alpha)
+    margin = min(width, height) // 12
+    draw.rounded_rectangle((margin, margin, width - margin, height - margin * 3), radius=margin, fill=0)
+    alpha = alpha.filter(ImageFilter.GaussianBlur(3))
+    frame = Image.new('RGBA', (width, height), (230, 60, 120, 255))
+    frame.putalpha(alpha)
+    return frame
+
+
+def legacy(image_bytes: bytes, frame_rgba: Image.Image) -> Image.Image:
+    image = Image.open(io.BytesIO(image_bytes)).convert('RGBA')
+    return Image.alpha_composite(image, frame_rgba)
+
+
+def engine(image_bytes: bytes, overlay: FrameOverlay) -> Image.Image:
+    return overlay.apply(Image.open(io.BytesIO(image_bytes)))
+
+
+def timed(fn, runs: int, *args):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, sum(timings) / len(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('frame', nargs='?', help='Frame PNG to composite')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--size', default='1920x1080', help='Camera frame size WxH')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    camera = io.BytesIO()
+    synthetic_frame(width, height).convert('RGB').save(camera, format='JPEG', quality=92)
+    camera_bytes = camera.getvalue()
+
+    if args.frame:
+        frame_rgba = Image.open(args.frame).convert('RGBA').resize((width, height), Image.LANCZOS)
+    else:
+        frame_rgba = synthetic_overlay(width, height)
+
+    start = time.perf_counter()
+    overlay = FrameOverlay(frame_rgba)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Camera {width}x{height}, {args.runs} run(s); overlay prepared once in {build_ms:.1f} ms "
+          f"({len(overlay.opaque_boxes)} copy / {len(overlay.blend_boxes)} blend regions)")
+
+    decoded = Image.open(io.BytesIO(camera_bytes)).convert('RGB')
+    rows = [
+        ('decode + convert + alpha_composite', legacy, camera_bytes, frame_rgba),
+        ('decode + tiled overlay', engine, camera_bytes, overlay),
+        ('convert + alpha_composite only', lambda img, f: Image.alpha_composite(img.convert('RGBA'), f), decoded, frame_rgba),
+        ('tiled overlay only', lambda img, o: o.apply(img), decoded, overlay),
+    ]
+    print(f"{'path':<38}{'avg ms':>10}{'min ms':>10}")
+    results = []
+    for label, fn, *fn_args in rows:
+        result, avg, low = timed(fn, args.runs, *fn_args)
+        results.append(result)
+        print(f"{label:<38}{avg:>10.1f}{low:>10.1f}")
+    diff = ImageChops.difference(results[0].convert('RGB'), results[1].convert('RGB')).getextrema()
+    print(f"Max channel difference: {max(high for _, high in diff)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Report encode time and output size for each photo format on a sample frame.
+
+Usage: benchmark_encoders.py [image] [--runs N] [--size 1920x1080]
+Without an image a synthetic camera frame is generated.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from app.utils.image_encoder import encode_image  # noqa: E402
+
+CONFIGS = [
+    ('png level 1', {'format': 'png', 'png_compress_level': 1}),
+    ('png level 6', {'format': 'png', 'png_compress_level': 6}),
+    ('png level 9', {'format': 'png', 'png_compress_level': 9}),
+    ('jpeg q80', {'format': 'jpeg', 'jpeg_quality': 80}),
+    ('jpeg q90', {'format': 'jpeg', 'jpeg_quality': 90}),
+    ('webp q80', {'format': 'webp', 'webp_quality': 80}),
+    ('webp q90', {'format': 'webp', 'webp_quality': 90}),
+]
+
+
+def synthetic_frame(width: int, height: int) -> Image.Image:
+    """Noisy gradient with shapes, closer to a camera shot than a flat fill"""
+    base = Image.effect_noise((width, height), 40).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (gradient, base.getchannel('G'), gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        x, y = (i * 157) % width, (i * 89) % height
+        draw.ellipse((x, y, x + width // 6, y + height // 6), fill=((i * 40) % 256, 120, 200))
+    return image.filter(ImageFilter.GaussianBlur(1)).convert('RGBA')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('image', nargs='?', help='Sample photo to encode')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--size', default='1920x1080', help='Synthetic frame size WxH')
+    args = parser.parse_args()
+
+    if args.image:
+        image = Image.open(args.image).convert('RGBA')
+    else:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+        image = synthetic_frame(width, height)
+
+    print(f"Sample: {image.size[0]}x{image.size[1]}, {args.runs} run(s) per format")
+    print(f"{'format':<14}{'avg ms':>10}{'min ms':>10}{'size KB':>10}")
+    for label, photo_settings in CONFIGS:
+        timings = []
+        size = 0
+        for _ in range(args.runs):
+            buf = io.BytesIO()
+            start = time.perf_counter()
+            encode_image(image, buf, photo_settings)
+            timings.append((time.perf_counter() - start) * 1000)
+            size = buf.tell()
+        print(f"{label:<14}{sum(timings) / len(timings):>10.1f}{min(timings):>10.1f}{size / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""Load-test the capture, gallery, TTS and Ollama paths and report the results as JSON.
+
+Usage: benchmark_suite.py [--output results.json] [--only upload,gallery] [--concurrency 4] [--requests 40]
+
+By default the app is served in-process (one threaded werkzeug server, i.e. one
+worker) on temporary folders, with local stub servers standing in for the TTS
+service and Ollama. With --url the upload and gallery benchmarks run against a
+running deployment instead (e.g. the Docker stack), and TTS/Ollama are skipped.
+Compare two runs by diffing their JSON files.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import PIL  # noqa: E402
+import requests  # noqa: E402
+
+from benchmark_compositing import synthetic_overlay  # noqa: E402
+from benchmark_encoders import synthetic_frame  # noqa: E402
+
+BENCHMARKS = ('upload', 'gallery', 'tts', 'ollama')
+FRAME_NAME = 'benchmark_frame.png'
+POLL_INTERVAL = 0.02
+JOB_TIMEOUT = 120
+# Roughly one second of 64 kbit/s MP3
+FAKE_MP3 = b'ID3' + bytes(8 * 1024)
+OLLAMA_TOKENS = ['Say ', 'cheese ', 'like ', 'you ', 'just ', 'won ', 'a ', 'lifetime ', 'supply! ', 'Smile!']
+
+_local = threading.local()
+VERIFY_TLS = True
+
+
+def session() -> requests.Session:
+    """One keep-alive session per load thread"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+        _local.session.verify = VERIFY_TLS
+    return _local.session
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """Latency summary in milliseconds (nearest-rank percentiles)"""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000, 2)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'min_ms': round(ordered[0] * 1000, 2),
+        'p50_ms': pct(50),
+        'p90_ms': pct(90),
+        'p99_ms': pct(99),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def run_load(call: Callable[[int], Any], total: int, concurrency: int) -> Tuple[List[Any], float]:
+    """Run ``call(i)`` for i in range(total) on ``concurrency`` threads; returns (results, wall seconds)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(call, range(total)))
+    return results, time.perf_counter() - start
+
+
+def timed_get(url: str, **kwargs) -> Tuple[float, int]:
+    start = time.perf_counter()
+    response = session().get(url, **kwargs)
+    response.content
+    return time.perf_counter() - start, response.status_code
+
+
+def repeat(url: str, runs: int, concurrency: int = 1, **kwargs) -> Dict[str, Any]:
+    results, wall = run_load(lambda _: timed_get(url, **kwargs), runs, concurrency)
+    statuses: Dict[str, int] = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {'latency': summarize([t for t, _ in results]), 'status_codes': statuses, 'requests_per_second': round(runs / wall, 2)}
+
+
+# --- stub upstreams ---------------------------------------------------------
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Fake Google TTS and Ollama endpoints with a fixed think time"""
+    protocol_version = 'HTTP/1.1'
+    # TCP_NODELAY: headers and body go out as separate writes, and Nagle would hold the
+    # body until the client's delayed ACK (~40 ms) on a kept-alive connection
+    disable_nagle_algorithm = True
+    delay = 0.05
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path.startswith('/translate_tts'):
+            time.sleep(self.delay)
+            self._send(FAKE_MP3, 'audio/mpeg')
+        elif self.path.startswith('/api/tags'):
+            self._send(json.dumps({'models': [{'name': 'bench:latest', 'size': 1}]}).encode(), 'application/json')
+        else:
+            self.send_error(404)
+
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.startswith('/api/chat'):
+            self.send_error(404)
+            return
+        if not payload.get('stream'):
+            time.sleep(self.delay)
+            self._send(json.dumps({'message': {'content': ''.join(OLLAMA_TOKENS)}, 'done': True}).encode(), 'application/json')
+            return
+        # Spread the think time over the tokens, like a real model
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, token in enumerate(OLLAMA_TOKENS):
+            time.sleep(self.delay / len(OLLAMA_TOKENS))
+            line = json.dumps({'message': {'content': token}, 'done': i == len(OLLAMA_TOKENS) - 1}).encode() + b'\n'
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections when many clients connect at once
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients drop kept-alive connections once a stream is done; that is not an error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(server) -> str:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+# --- benchmarks -------------------------------------------------------------
+
+def camera_shots(size: Tuple[int, int], variants: int = 4) -> List[bytes]:
+    """A few distinct JPEG captures (the noise differs per call), as a kiosk camera would send them"""
+    shots = []
+    for _ in range(variants):
+        image = synthetic_frame(*size).convert('RGB')
+        buf = io.BytesIO()
+        image.save(buf, format='JPEG', quality=90)
+        shots.append(buf.getvalue())
+    return shots
+
+
+def bench_upload(base_url: str, args, frame_name: str) -> Dict[str, Any]:
+    shots = camera_shots(args.size)
+
+    def capture(i: int) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response = session().post(
+            f"{base_url}/api/upload_photo/binary", params={'frame': frame_name},
+            data=shots[i % len(shots)], headers={'Content-Type': 'image/jpeg'},
+        )
+        accepted = time.perf_counter() - start
+        if response.status_code != 202:
+            return {'status': response.status_code, 'accept': accepted}
+        status_url = base_url + response.json()['status_url']
+        status = 'queued'
+        while status not in ('done', 'error') and time.perf_counter() - start < JOB_TIMEOUT:
+            time.sleep(POLL_INTERVAL)
+            status = session().get(status_url).json().get('status')
+        return {'status': 202, 'accept': accepted, 'job': status, 'complete': time.perf_counter() - start}
+
+    results, wall = run_load(capture, args.requests, args.concurrency)
+    done = [r for r in results if r.get('job') == 'done']
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'image_size': f"{args.size[0]}x{args.size[1]}",
+        'image_kb': round(sum(len(s) for s in shots) / len(shots) / 1024, 1),
+        'frame': frame_name or None,
+        'completed': len(done),
+        'rejected_503': sum(1 for r in results if r['status'] == 503),
+        'failed': sum(1 for r in results if r['status'] not in (202, 503) or r.get('job') not in (None, 'done')),
+        'wall_seconds': round(wall, 3),
+        'photos_per_second': round(len(done) / wall, 2),
+        'accept_latency': summarize([r['accept'] for r in results]),
+        'completion_latency': summarize([r['complete'] for r in done]),
+    }
+
+
+def fill_photos(folder: str, count: int) -> None:
+    """Write ``count`` small JPEGs with distinct, realistic photo names"""
+    os.makedirs(folder, exist_ok=True)
+    buf = io.BytesIO()
+    synthetic_frame(320, 240).convert('RGB').save(buf, format='JPEG', quality=70)
+    data = buf.getvalue()
+    base = time.mktime((2024, 6, 1, 12, 0, 0, 0, 0, -1))
+    for i in range(count):
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(base + i * 7))
+        with open(os.path.join(folder, f"photo_{stamp}_{i:06x}.jpg"), 'wb') as f:
+            f.write(data)
+
+
+def bench_gallery(base_url: str, args, app=None) -> Dict[str, Any]:
+    result: Dict[str, Any] = {'runs': args.runs}
+    if app is not None:
+        photos_folder = os.path.join(args.workdir, 'gallery')
+        start = time.perf_counter()
+        fill_photos(photos_folder, args.photos)
+        result['photos'] = args.photos
+        result['fill_seconds'] = round(time.perf_counter() - start, 3)
+        app.config['PHOTOS_FOLDER'] = photos_folder
+        # The first request builds the photo index for the whole folder
+        cold, status = timed_get(f"{base_url}/gallery")
+        result['cold_first_render'] = {'ms': round(cold * 1000, 2), 'status': status}
+
+    result['render'] = repeat(f"{base_url}/gallery", args.runs)
+    result['render_concurrent'] = repeat(f"{base_url}/gallery", args.runs * args.concurrency, args.concurrency)
+    first_page = session().get(f"{base_url}/api/photos", params={'limit': 200}).json()
+    cursor = (first_page.get('next') or '') if isinstance(first_page, dict) else ''
+    result['api_page'] = repeat(f"{base_url}/api/photos", args.runs, params={'limit': 24, 'after': cursor})
+    return result
+
+
+def bench_tts(base_url: str, args) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    url = f"{base_url}/api/tts/speak"
+
+    def speak(i: int) -> Tuple[float, int]:
+        return timed_get(url, params={'service': 'google', 'voice': 'en', 'text': f"Benchmark {run_id} line {i}"})
+
+    cold, wall = run_load(speak, args.requests, args.concurrency)
+    warm_params = {'service': 'google', 'voice': 'en', 'text': f"Benchmark {run_id} line 0"}
+    etag = session().get(url, params=warm_params).headers.get('ETag', '')
+    return {
+        'stub_delay_ms': args.stub_delay_ms,
+        'synthesize': {
+            'latency': summarize([t for t, _ in cold]),
+            'errors': sum(1 for _, s in cold if s != 200),
+            'requests_per_second': round(args.requests / wall, 2),
+        },
+        'cache_hit': repeat(url, args.requests, args.concurrency, params=warm_params),
+        'not_modified': repeat(url, args.requests, args.concurrency, params=warm_params, headers={'If-None-Match': etag}),
+    }
+
+
+def bench_ollama(base_url: str, args, store, stub_url: str) -> Dict[str, Any]:
+    from app.services.ollama_service import OllamaService
+
+    def configure(pool_size: int) -> None:
+        settings = store.read()
+        settings['ollama'].update({'enabled': True, 'url': stub_url, 'model': 'bench:latest', 'api_key': '', 'pool_size': pool_size})
+        store.write(settings)
+
+    def sse(i: int) -> Dict[str, float]:
+        start = time.perf_counter()
+        first = None
+        with session().get(f"{base_url}/api/ollama/generate-prompt/stream", stream=True) as response:
+            for line in response.iter_lines():
+                if line.startswith(b'event: sentence') and first is None:
+                    first = time.perf_counter() - start
+        total = time.perf_counter() - start
+        return {'first_sentence': first if first is not None else total, 'total': total}
+
+    result: Dict[str, Any] = {'stub_delay_ms': args.stub_delay_ms}
+    configure(0)
+    result['direct'] = _post_repeat(f"{base_url}/api/ollama/generate-prompt", args.requests, args.concurrency)
+
+    configure(5)
+    # Let the prompt pool fill before measuring it
+    OllamaService(stub_url).list_models()
+    session().post(f"{base_url}/api/ollama/generate-prompt", json={})
+    time.sleep(max(0.5, args.stub_delay_ms / 1000 * 6))
+    result['pool'] = _post_repeat(f"{base_url}/api/ollama/generate-prompt", args.requests, args.concurrency)
+
+    streams, _ = run_load(sse, args.requests, args.concurrency)
+    result['stream'] = {
+        'first_sentence': summarize([s['first_sentence'] for s in streams]),
+        'total': summarize([s['total'] for s in streams]),
+    }
+    return result
+
+
+def _post_repeat(url: str, total: int, concurrency: int) -> Dict[str, Any]:
+    def call(_: int) -> Tuple[float, str]:
+        start = time.perf_counter()
+        response = session().post(url, json={})
+        body = response.json() if response.status_code == 200 else {}
+        return time.perf_counter() - start, body.get('source', str(response.status_code))
+
+    results, wall = run_load(call, total, concurrency)
+    sources: Dict[str, int] = {}
+    for _, source in results:
+        sources[source] = sources.get(source, 0) + 1
+    return {'latency': summarize([t for t, _ in results]), 'sources': sources, 'requests_per_second': round(total / wall, 2)}
+
+
+# --- setup ------------------------------------------------------------------
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def in_process_app(workdir: str):
+    """Create the app on temporary folders and serve it on a free local port"""
+    os.environ.setdefault('TTS_CACHE_FOLDER', os.path.join(workdir, 'tts'))
+    os.environ.setdefault('METRICS_FOLDER', os.path.join(workdir, 'metrics'))
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    app = create_app()
+    app.config.update(
+        UPLOAD_FOLDER=os.path.join(workdir, 'frames'),
+        PHOTOS_FOLDER=os.path.join(workdir, 'photos'),
+        SETTINGS_PATH=os.path.join(workdir, 'config', 'settings.json'),
+        SHARE_QUEUE_PATH=os.path.join(workdir, 'config', 'outbox.sqlite3'),
+    )
+    for path in (app.config['UPLOAD_FOLDER'], app.config['PHOTOS_FOLDER'], os.path.dirname(app.config['SETTINGS_PATH'])):
+        os.makedirs(path, exist_ok=True)
+    return app, start_server(make_server('127.0.0.1', 0, app, threaded=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument('--url', help='Benchmark a running deployment instead of an in-process server')
+    parser.add_argument('--insecure', action='store_true', help="Don't verify TLS certificates (the Docker stack's self-signed one)")
+    parser.add_argument('--frame', default=None, help='Frame to composite with (--url mode: an existing frame name)')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per load test')
+    parser.add_argument('--concurrency', type=int, default=4, help='Parallel clients')
+    parser.add_argument('--runs', type=int, default=20, help='Sequential requests per latency test')
+    parser.add_argument('--size', default='1920x1080', help='Synthetic camera frame size WxH')
+    parser.add_argument('--photos', type=int, default=10000, help='Photos in the synthetic gallery folder')
+    parser.add_argument('--stub-delay-ms', type=int, default=50, help='Think time of the TTS and Ollama stubs')
+    args = parser.parse_args()
+    global VERIFY_TLS
+    VERIFY_TLS = not args.insecure
+    if args.insecure:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    args.size = tuple(int(v) for v in args.size.lower().split('x'))
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    report: Dict[str, Any] = {
+        'environment': environment(),
+        'config': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='photobooth-bench-') as workdir:
+        args.workdir = workdir
+        app = None
+        if args.url:
+            base_url = args.url.rstrip('/')
+            frame_name = args.frame or ''
+            report['config']['server'] = 'external'
+        else:
+            app, base_url = in_process_app(workdir)
+            frame_name = args.frame or FRAME_NAME
+            synthetic_overlay(*args.size).save(os.path.join(app.config['UPLOAD_FOLDER'], FRAME_NAME))
+            report['config']['server'] = 'in-process werkzeug, 1 worker'
+
+            StubHandler.delay = args.stub_delay_ms / 1000
+            stub_url = start_server(StubServer(('127.0.0.1', 0), StubHandler))
+            from app.routes import tts as tts_routes
+            tts_routes.TTS_SERVICES['google']['url'] = f"{stub_url}/translate_tts"
+
+        for name in selected:
+            if app is None and name in ('tts', 'ollama'):
+                report['results'][name] = {'skipped': 'needs the in-process server and stubs'}
+                continue
+            print(f"Running {name}...", file=sys.stderr, flush=True)
+            if name == 'upload':
+                report['results'][name] = bench_upload(base_url, args, frame_name)
+            elif name == 'gallery':
+                report['results'][name] = bench_gallery(base_url, args, app)
+            elif name == 'tts':
+                report['results'][name] = bench_tts(base_url, args)
+            else:
+                from app.utils.settings_store import SettingsStore
+                report['results'][name] = bench_ollama(base_url, args, SettingsStore(app.config['SETTINGS_PATH']), stub_url)
+
+        # Wait for background thumbnail work so the temp folder can be removed cleanly
+        if app is not None:
+            from app.services.photo_pipeline import photo_pipeline
+            photo_pipeline._executor.shutdown(wait=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
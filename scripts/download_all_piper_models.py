@@ -1,63 +1,188 @@
 #!/usr/bin/env python3
+"""Download Piper voices (model + config) listed in voices.json, in parallel.
+
+Usage: download_all_piper_models.py [target_dir] [--language en_US] [--quality medium] [--workers 4]
+
+Interrupted downloads resume from their ``.part`` file with an HTTP range
+request, and every file is checked against the size and MD5 in the manifest
+before it is moved into place. Point --manifest-url/--base-url at a local
+server to test without the internet.
+"""
+import argparse
+import hashlib
 import json
 import os
 import sys
+import threading
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 
 FALLBACK_URLS = [
     "https://huggingface.co/rhasspy/piper-voices/resolve/main/voices.json",
     "https://raw.githubusercontent.com/rhasspy/piper-voices/main/voices.json",
 ]
+# Files in the manifest are relative to the repository root
+DEFAULT_BASE_URL = "https://huggingface.co/rhasspy/piper-voices/resolve/main/"
+VOICE_SUFFIXES = (".onnx", ".onnx.json")
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT = 30
+
+_print_lock = threading.Lock()
+
+
+def log(message: str, error: bool = False) -> None:
+    with _print_lock:
+        print(message, file=sys.stderr if error else sys.stdout, flush=True)
 
 
 def fetch_json(url: str):
-    with urllib.request.urlopen(url, timeout=30) as resp:
+    with urllib.request.urlopen(url, timeout=TIMEOUT) as resp:
         return json.loads(resp.read().decode("utf-8"))
 
 
-def main():
-    target_dir = sys.argv[1] if len(sys.argv) > 1 else "./piper/models"
-    os.makedirs(target_dir, exist_ok=True)
-
-    data = None
+def load_manifest(urls: List[str]) -> Dict[str, Any]:
     last_err = None
-    for url in FALLBACK_URLS:
+    for url in urls:
         try:
-            data = fetch_json(url)
-            break
+            return fetch_json(url)
         except Exception as e:
             last_err = e
-    if data is None:
-        print(f"Failed to fetch voices.json: {last_err}", file=sys.stderr)
-        sys.exit(1)
+    raise RuntimeError(f"Failed to fetch voices.json: {last_err}")
+
 
-    # voices.json structure: { lang: { voice: { quality: { files: { 'onnx': url } } } } }
-    count = 0
-    for lang, voices in data.items():
-        if not isinstance(voices, dict):
+def select_files(manifest: Dict[str, Any], languages: List[str], qualities: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Return (relative path, metadata) for the model and config of every matching voice.
+
+    A language filter matches the full code (``en_US``) or the family (``en``).
+    """
+    selected = []
+    for key, voice in sorted(manifest.items()):
+        if not isinstance(voice, dict):
+            continue
+        language = voice.get("language") or {}
+        if languages and not {language.get("code"), language.get("family")} & set(languages):
             continue
-        for voice, variants in voices.items():
-            if not isinstance(variants, dict):
-                continue
-            for quality, meta in variants.items():
-                files = meta.get("files") or {}
-                onnx = files.get("onnx")
-                if not onnx:
-                    continue
-                fname = os.path.basename(onnx)
-                dest = os.path.join(target_dir, fname)
-                if os.path.exists(dest):
-                    continue
-                try:
-                    print(f"Downloading {fname} ...")
-                    urllib.request.urlretrieve(onnx, dest)
-                    count += 1
-                except Exception as e:
-                    print(f"Failed {fname}: {e}", file=sys.stderr)
-    print(f"Downloaded {count} model(s) to {target_dir}")
+        if qualities and voice.get("quality") not in qualities:
+            continue
+        for path, meta in sorted((voice.get("files") or {}).items()):
+            if path.endswith(VOICE_SUFFIXES):
+                selected.append((path, meta or {}))
+    return selected
 
 
-if __name__ == "__main__":
-    main()
+def md5_of(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_complete(path: str, size: Optional[int], md5: Optional[str]) -> bool:
+    if not os.path.exists(path):
+        return False
+    if size is not None and os.path.getsize(path) != size:
+        return False
+    return md5 is None or md5_of(path) == md5
+
 
+def _fetch_into(url: str, part_path: str) -> None:
+    """Append the rest of ``url`` to ``part_path``, restarting if the server ignores the range"""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    try:
+        resp = urllib.request.urlopen(request, timeout=TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:  # nothing left to fetch; the checksum decides
+            return
+        raise
+    with resp:
+        mode = "ab" if offset and resp.status == 206 else "wb"
+        with open(part_path, mode) as f:
+            for chunk in iter(lambda: resp.read(CHUNK_SIZE), b""):
+                f.write(chunk)
 
+
+def download_file(url: str, dest: str, size: Optional[int], md5: Optional[str], retries: int = 3) -> bool:
+    """Download to ``dest`` through ``dest.part``; returns False if already up to date"""
+    if is_complete(dest, size, md5):
+        return False
+    part_path = f"{dest}.part"
+    for attempt in range(1, retries + 1):
+        try:
+            _fetch_into(url, part_path)
+        except (OSError, urllib.error.URLError) as e:
+            # Keep the partial file: the next attempt resumes from it
+            if attempt == retries:
+                raise
+            log(f"Retrying {os.path.basename(dest)} ({attempt}/{retries}): {e}", error=True)
+            continue
+        if is_complete(part_path, size, md5):
+            os.replace(part_path, dest)
+            return True
+        # Corrupt or wrong length: start over from scratch
+        os.remove(part_path)
+        if attempt == retries:
+            raise RuntimeError("size or checksum mismatch")
+        log(f"Checksum mismatch for {os.path.basename(dest)}, retrying ({attempt}/{retries})", error=True)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("target_dir", nargs="?", default="./piper/models")
+    parser.add_argument("--language", action="append", default=[], help="Language code or family, e.g. en_US or en (repeatable)")
+    parser.add_argument("--quality", action="append", default=[], help="x_low, low, medium or high (repeatable)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel downloads")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--manifest-url", action="append", help="voices.json location (repeatable; tried in order)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="URL the manifest's file paths are relative to")
+    args = parser.parse_args()
+
+    os.makedirs(args.target_dir, exist_ok=True)
+    try:
+        manifest = load_manifest(args.manifest_url or FALLBACK_URLS)
+    except RuntimeError as e:
+        log(str(e), error=True)
+        sys.exit(1)
+
+    files = select_files(manifest, args.language, args.quality)
+    log(f"{len(files)} file(s) selected, downloading with {args.workers} worker(s)")
+    base_url = args.base_url if args.base_url.endswith("/") else f"{args.base_url}/"
+
+    downloaded = skipped = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            pool.submit(
+                download_file,
+                base_url + path,
+                os.path.join(args.target_dir, os.path.basename(path)),
+                meta.get("size_bytes"),
+                meta.get("md5_digest"),
+                args.retries,
+            ): os.path.basename(path)
+            for path, meta in files
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                if future.result():
+                    downloaded += 1
+                    log(f"Downloaded {name}")
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                log(f"Failed {name}: {e}", error=True)
+
+    log(f"Downloaded {downloaded}, already present {skipped}, failed {failed} in {args.target_dir}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
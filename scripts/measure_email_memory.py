@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare peak Python memory of one email share with and without the size cap and streaming.
+
+Usage: measure_email_memory.py [photo] [--size 4000x3000]
+Without a photo a synthetic PNG is generated. Messages go to a throwaway local
+SMTP sink, so no mail leaves the machine.
+"""
+import argparse
+import os
+import shutil
+import smtplib
+import socket
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_encoders import synthetic_frame  # noqa: E402
+
+from app.services.derivatives import ensure_derivative  # noqa: E402
+from app.services.email_service import SMTPSender, build_message  # noqa: E402
+
+
+def smtp_sink() -> int:
+    """Start a minimal SMTP server that accepts and discards every message; returns its port"""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+
+    def handle(conn: socket.socket) -> None:
+        f = conn.makefile('rb')
+        conn.sendall(b'220 sink\r\n')
+        for line in f:
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                conn.sendall(b'250 sink\r\n')
+            elif command == b'DATA':
+                conn.sendall(b'354 go ahead\r\n')
+                for data_line in f:
+                    if data_line == b'.\r\n':
+                        break
+                conn.sendall(b'250 queued\r\n')
+            elif command == b'QUIT':
+                conn.sendall(b'221 bye\r\n')
+                break
+            else:
+                conn.sendall(b'250 ok\r\n')
+        conn.close()
+
+    def serve() -> None:
+        while True:
+            conn, _ = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def legacy_send(port: int, path: str) -> None:
+    message = build_message('booth@example.com', 'guest@example.com', 'Photo', 'Hi', path)
+    with smtplib.SMTP('127.0.0.1', port) as server:
+        server.sendmail('booth@example.com', ['guest@example.com'], message.as_string())
+
+
+def streaming_send(port: int, path: str, name: str) -> None:
+    with SMTPSender('127.0.0.1', port, '', '', use_tls=False) as sender:
+        sender.send('booth@example.com', 'guest@example.com', 'Photo', 'Hi', path, name)
+
+
+def peak_kb(fn, *args) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('photo', nargs='?', help='Photo to share')
+    parser.add_argument('--size', default='4000x3000', help='Synthetic photo size WxH')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='email-memory-')
+    try:
+        if args.photo:
+            filename = os.path.basename(args.photo)
+            shutil.copy2(args.photo, os.path.join(workdir, filename))
+        else:
+            width, height = (int(v) for v in args.size.lower().split('x'))
+            filename = 'sample.png'
+            synthetic_frame(width, height).save(os.path.join(workdir, filename), compress_level=1)
+        source = os.path.join(workdir, filename)
+        derivative = ensure_derivative(workdir, 'email', filename)
+        port = smtp_sink()
+
+        print(f"Original: {os.path.getsize(source) / 1024:.0f} KB, email derivative: {os.path.getsize(derivative) / 1024:.0f} KB")
+        print(f"{'path':<34}{'peak KB':>10}")
+        print(f"{'original, as_string + sendmail':<34}{peak_kb(legacy_send, port, source):>10.0f}")
+        print(f"{'original, streamed':<34}{peak_kb(streaming_send, port, source, filename):>10.0f}")
+        print(f"{'derivative, streamed':<34}{peak_kb(streaming_send, port, derivative, 'sample.jpg'):>10.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
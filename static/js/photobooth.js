@@ -75,6 +75,8 @@ function drawOverlayMask(frameImg) {
             });
             
             const audio = new Audio(`/api/tts/speak?${params.toString()}`);
+            // Every provider failed or timed out: fall back to browser speech
+            audio.onerror = () => window.speechSynthesis && speechSynthesis.speak(new SpeechSynthesisUtterance(text));
             audio.play().catch(e => console.error('TTS audio play failed:', e));
         }
     }
@@ -156,6 +158,14 @@ async function countdown(seconds) {
   }
 }
 
+function canvasToBlob(canvas) {
+  // Prefer WebP where the browser can encode it, otherwise JPEG
+  return new Promise(resolve => canvas.toBlob(blob => {
+    if (blob && blob.type === 'image/webp') { resolve(blob); return; }
+    canvas.toBlob(resolve, 'image/jpeg', 0.92);
+  }, 'image/webp', 0.92));
+}
+
 async function capture() {
   // Prepare offscreen canvas
   const off = document.createElement('canvas');
@@ -166,14 +176,16 @@ async function capture() {
   if (currentFrameImg) {
     ctx.drawImage(currentFrameImg, 0, 0, off.width, off.height);
   }
-  const dataUrl = off.toDataURL('image/png');
+  const blob = await canvasToBlob(off);
   // Show preview
   const pctx = previewCanvas.getContext('2d');
   const img = new Image();
-  await new Promise(resolve => { img.onload = resolve; img.src = dataUrl; });
+  const objectUrl = URL.createObjectURL(blob);
+  await new Promise(resolve => { img.onload = resolve; img.src = objectUrl; });
   pctx.clearRect(0, 0, previewCanvas.width, previewCanvas.height);
   pctx.drawImage(img, 0, 0, previewCanvas.width, previewCanvas.height);
-  return dataUrl;
+  URL.revokeObjectURL(objectUrl);
+  return blob;
 }
 
 startBtn.addEventListener('click', async () => {
@@ -183,18 +195,32 @@ startBtn.addEventListener('click', async () => {
     speak(settings.tts?.prompt || 'Get ready!');
   }
   await countdown(3);
-  const imgData = await capture();
+  const blob = await capture();
   const frame = frameSelect.value || '';
-  const res = await fetch('/api/upload_photo', {
-    method: 'POST', headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ image: imgData, frame })
+  const res = await fetch(`/api/upload_photo/binary?frame=${encodeURIComponent(frame)}`, {
+    method: 'POST', headers: { 'Content-Type': blob.type },
+    body: blob
   });
   const data = await res.json();
   if (!res.ok) { alert(data.error || 'Failed to upload'); return; }
+  const job = await waitForPhoto(data.status_url);
+  if (job.status !== 'done') { alert(job.error || 'Failed to process photo'); return; }
   sharePanel.hidden = false;
-  sharePanel.dataset.filename = data.filename;
+  sharePanel.dataset.filename = job.filename;
 });
 
+async function waitForPhoto(statusUrl, timeoutMs = 60000) {
+  // Uploads are processed in the background; poll until the photo is written
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const res = await fetch(statusUrl);
+    const job = await res.json();
+    if (job.status === 'done' || job.status === 'error') return job;
+    await new Promise(resolve => setTimeout(resolve, 250));
+  }
+  return { status: 'error', error: 'Timed out waiting for photo' };
+}
+
 emailBtn.addEventListener('click', async () => {
   const email = document.getElementById('emailInput').value;
   const filename = sharePanel.dataset.filename;
@@ -202,7 +228,7 @@ emailBtn.addEventListener('click', async () => {
     method: 'POST', headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ filename, email })
   });
-  alert(res.ok ? 'Email sent' : 'Failed to send email');
+  alert(res.ok ? 'Email queued for delivery' : 'Failed to send email');
 });
 
 smsBtn.addEventListener('click', async () => {
@@ -212,7 +238,7 @@ smsBtn.addEventListener('click', async () => {
     method: 'POST', headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ filename, phone })
   });
-  alert(res.ok ? 'SMS sent' : 'Failed to send SMS');
+  alert(res.ok ? 'SMS queued for delivery' : 'Failed to send SMS');
 });
 
 (async function main() {